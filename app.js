@@ -1,7 +1,9 @@
 // ===== Backend URLs =====
 const BASE_URL = "http://127.0.0.1:8000";
 const CHAT_URL = `${BASE_URL}/chat`;
+const CHAT_STREAM_URL = `${BASE_URL}/chat/stream`;
 const UPLOAD_URL = `${BASE_URL}/upload_pdf`;
+const UPLOAD_STATUS_URL = `${BASE_URL}/upload_status`;
 
 // ===== DOM =====
 const chatEl = document.getElementById("chat");
@@ -56,6 +58,30 @@ checkApi();
 setInterval(checkApi, 4000);
 
 // ===== Chat =====
+// Reads Server-Sent Events from a fetch() body and calls onEvent(event, data) for each one.
+async function readSSE(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buf.indexOf("\n\n")) !== -1) {
+      const raw = buf.slice(0, sep);
+      buf = buf.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      onEvent(event, data ? JSON.parse(data) : {});
+    }
+  }
+}
+
 async function sendMessage(msg) {
   const session_id = sessionEl.value.trim() || "default";
   addMsg("me", msg);
@@ -63,7 +89,7 @@ async function sendMessage(msg) {
   countdownEl.textContent = "";
 
   try {
-    const r = await fetch(CHAT_URL, {
+    const r = await fetch(CHAT_STREAM_URL, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ session_id, text: msg })
@@ -76,9 +102,25 @@ async function sendMessage(msg) {
       return;
     }
 
-    const data = await r.json();
-    const answer = data.output ?? "(no output)";
-    addMsg("jarvis", answer);
+    let bubble = null;
+    let answer = "";
+    await readSSE(r, (event, data) => {
+      if (event === "token") {
+        if (!bubble) {
+          addMsg("jarvis", "");
+          bubble = chatEl.lastChild.querySelector(".bubble");
+        }
+        answer += data.text;
+        bubble.textContent = answer;
+        chatEl.scrollTop = chatEl.scrollHeight;
+      } else if (event === "done") {
+        answer = data.output ?? answer;
+      } else if (event === "error") {
+        addMsg("jarvis", "❌ " + data.error);
+      }
+    });
+
+    if (!bubble) addMsg("jarvis", answer || "(no output)");
     speak(answer);
     statusEl.textContent = "Ready.";
   } catch (e) {
@@ -99,6 +141,28 @@ textEl.addEventListener("keydown", (e) => {
 });
 
 // ===== PDF Upload =====
+// give up polling after this long (the server also fails jobs whose worker died)
+const INDEX_POLL_TIMEOUT_MS = 15 * 60 * 1000;
+
+async function waitForIndexing(jobId) {
+  const deadline = Date.now() + INDEX_POLL_TIMEOUT_MS;
+  while (true) {
+    if (Date.now() > deadline) {
+      return { ok: false, error: "Timed out waiting for indexing. Check /upload_status or upload again." };
+    }
+    const r = await fetch(`${UPLOAD_STATUS_URL}/${jobId}`);
+    const job = await r.json();
+    if (!job.ok) return job;
+    if (job.status === "done" || job.status === "error") return job;
+    if (job.pages_total) {
+      statusEl.textContent = `Indexing PDF… ${job.pages_done}/${job.pages_total} pages`;
+    } else {
+      statusEl.textContent = "Indexing PDF…";
+    }
+    await new Promise((res) => setTimeout(res, 700));
+  }
+}
+
 uploadBtn.addEventListener("click", async () => {
   const f = pdfFile.files[0];
   if (!f) {
@@ -128,9 +192,17 @@ uploadBtn.addEventListener("click", async () => {
       return;
     }
 
+    uploadBtn.textContent = "Indexing…";
+    const job = data.status === "done" ? data : await waitForIndexing(data.job_id);
+    if (!job.ok || job.status === "error") {
+      addMsg("jarvis", "❌ Indexing failed: " + (job.error || "Unknown error"));
+      statusEl.textContent = "Ready.";
+      return;
+    }
+
     addMsg(
       "jarvis",
-      `✅ PDF uploaded: ${data.filename}\nChunks indexed: ${data.chunks_indexed}\nNow ask:\n/pdf ask <question> | source=${data.filename}`
+      `✅ PDF uploaded: ${data.filename}\nChunks indexed: ${job.chunks_indexed}\nNow ask:\n/pdf ask <question> | source=${data.filename}`
     );
     statusEl.textContent = "Ready.";
   } catch (e) {
@@ -1,41 +1,22 @@
-import inspect
+from brain import SkillSpec, make_adapter
 from rag_pdf import get_active_pdf
+import intents
 
-PDF_STRONG_TRIGGERS = [
-    "this pdf",
-    "this document",
-    "this file",
-    "uploaded pdf",
-    "uploaded document",
-    "resume",
-    "cv",
-    "in the pdf",
-    "from the pdf",
-    "from this document",
-]
+# trigger phrases are configured in intents.py
+PDF_STRONG_TRIGGERS = intents.matcher.trigger_sets.get("pdf", [])
 
 def looks_like_pdf_question(text: str) -> bool:
-    t = (text or "").lower()
-    return any(k in t for k in PDF_STRONG_TRIGGERS)
+    return "pdf" in intents.classify(text)
 
 def _get_pdf_skill(skills: dict):
     return skills.get("/pdf") or skills.get("pdf") or skills.get("/doc")
 
 def call_skill(fn, arg, session_id, llm):
-    sig = inspect.signature(fn)
-    params = sig.parameters
-
-    if len(params) == 2:
-        ctx = {"session_id": session_id, "llm": llm}
+    ctx = {"session_id": session_id, "llm": llm}
+    # SkillSpec from brain.load_skills already carries a precomputed adapter + counters
+    if isinstance(fn, SkillSpec):
         return fn(arg, ctx)
-
-    kwargs = {}
-    if "session_id" in params:
-        kwargs["session_id"] = session_id
-    if "llm" in params:
-        kwargs["llm"] = llm
-
-    return fn(arg, **kwargs)
+    return make_adapter(fn)(arg, ctx)
 
 def auto_route(text: str, llm, skills, session_id="default"):
     if not text:
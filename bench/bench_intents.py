@@ -0,0 +1,39 @@
+# Precision check + micro-benchmark for the intent matcher: python bench/bench_intents.py
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intents import DEFAULT_TRIGGERS, IntentMatcher
+from tests.test_intents import CORPUS
+
+
+def main() -> None:
+    def substring_intents(text):
+        t = text.lower()
+        return {name for name, phrases in DEFAULT_TRIGGERS.items() if any(k in t for k in phrases)}
+
+    m = IntentMatcher(DEFAULT_TRIGGERS, cache_size=0)  # time the matcher itself, not the memo
+    for label, fn in [("substring", substring_intents), ("matcher", lambda t: set(m.classify(t)))]:
+        tp = fp = fn_ = 0
+        for text, expected in CORPUS:
+            got = fn(text)
+            tp += len(got & expected)
+            fp += len(got - expected)
+            fn_ += len(expected - got)
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn_) if tp + fn_ else 1.0
+        print(f"{label:10} precision={precision:.2f} recall={recall:.2f} false_positives={fp}")
+
+    texts = [t for t, _ in CORPUS]
+    n = 5000
+    old = timeit.timeit(lambda: [substring_intents(t) for t in texts], number=n)
+    new = timeit.timeit(lambda: [m.classify(t) for t in texts], number=n)
+    total = n * len(texts)
+    print(f"substring scans: {old / total * 1e6:.2f} µs/message")
+    print(f"matcher (uncached): {new / total * 1e6:.2f} µs/message")
+
+
+if __name__ == "__main__":
+    main()
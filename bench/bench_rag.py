@@ -0,0 +1,97 @@
+# Latency / recall benchmark for PDF retrieval on a small bundled corpus: python bench/bench_rag.py
+# Runs against a throwaway JARVIS_RAG_DIR so it never touches real sessions.
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["JARVIS_RAG_DIR"] = tempfile.mkdtemp(prefix="jarvis-bench-")
+
+import rag_store  # noqa: E402  (must come after JARVIS_RAG_DIR is set)
+from rag_pdf import (  # noqa: E402
+    LEXICAL_DEPTH,
+    VECTOR_DEPTH,
+    _lexical_candidates,
+    _session_vectors,
+    _vector_candidates,
+    retrieve_hits,
+    sync_vectors,
+)
+
+
+def main() -> None:
+    # (chunk, questions answered by it); questions mix paraphrases and exact part numbers.
+    # Pure paraphrases with no shared word stems ("guarantee" vs "warranty") need a real
+    # embedding model (JARVIS_EMBEDDER=hf:...); the hashing default cannot match them.
+    corpus = [
+        ("Invoices are payable within thirty days of delivery. Late payments accrue 2% monthly interest.",
+         ["when do I have to pay the invoice", "what happens if I pay late"]),
+        ("To reset the router, hold the recessed button for ten seconds until the status light blinks amber.",
+         ["how do I restart my router to factory settings"]),
+        ("Replacement filter cartridge part number FX-2291-B fits all 2019 and later purifier models.",
+         ["FX-2291-B", "which filter cartridge do I need for my purifier"]),
+        ("The warranty covers manufacturing defects for 24 months and excludes water damage and misuse.",
+         ["is water damage covered by the warranty", "how long is the guarantee"]),
+        ("Employees accrue 1.5 vacation days per month, capped at 30 days of carried-over leave.",
+         ["how many holidays do staff earn", "maximum leave carried over"]),
+        ("Error code E-47 indicates a blocked drain pump; clean the pump filter behind the lower panel.",
+         ["E-47", "the washer will not drain what should I do"]),
+        ("Shipping to Karachi and Lahore takes 3 to 5 business days; remote areas may take up to 10 days.",
+         ["how long does delivery to karachi take"]),
+        ("The API rate limit is 600 requests per minute per key; bursts above that return HTTP 429.",
+         ["what is the request limit of the api", "why am I getting 429 responses"]),
+        ("Torque the M8 mounting bolts to 25 Nm in a cross pattern before connecting the power supply PSU-850.",
+         ["PSU-850", "how tight should the mounting bolts be"]),
+        ("Candidates must hold a bachelor's degree in computer science or a related engineering field.",
+         ["what education is required for applicants"]),
+        ("Refunds are issued to the original payment method within 7 working days after the return is received.",
+         ["how quickly will I get my money back"]),
+        ("The battery pack BP-3300 charges fully in 90 minutes and lasts about 8 hours of normal use.",
+         ["BP-3300 charging time", "how long does the battery last"]),
+    ]
+    filler_words = [f"lorem{i}" for i in range(3000)] + "the a of and to in is for with on".split()
+    random.seed(7)
+    filler = [" ".join(random.choices(filler_words, k=140)) for _ in range(3000)]
+
+    chunks = filler[:]
+    targets = []
+    for text, questions in corpus:
+        pos = random.randrange(len(chunks) + 1)
+        chunks.insert(pos, text)
+    for text, questions in corpus:
+        for q in questions:
+            targets.append((q, chunks.index(text)))
+
+    rag_store.write_chunks("bench", "sample.pdf", chunks)
+    start = time.perf_counter()
+    sync_vectors("bench", "sample.pdf")
+    print(f"{len(chunks)} chunks, vector indexing {time.perf_counter() - start:.2f}s "
+          f"({'on' if _session_vectors('bench') is not None else 'unavailable'})")
+
+    segments = [rag_store.open_chunks("bench", "sample.pdf")]
+    k = 4
+    modes = {
+        "lexical": lambda q: _lexical_candidates(segments, q, LEXICAL_DEPTH),
+        "vector": lambda q: _vector_candidates("bench", ["sample.pdf"], segments, q, VECTOR_DEPTH),
+        "hybrid": lambda q: [(0, h[1]) for h in retrieve_hits("bench", q, k=k, source_id="sample.pdf")],
+    }
+    for name, fn in modes.items():
+        fn(targets[0][0])  # warm up
+        found = 0
+        latencies = []
+        for q, want in targets:
+            t0 = time.perf_counter()
+            hits = fn(q)[:k]
+            latencies.append(time.perf_counter() - t0)
+            found += (0, want) in hits
+        latencies.sort()
+        print(f"{name:8} recall@{k}={found / len(targets):.2f} "
+              f"p50={latencies[len(latencies) // 2] * 1000:.2f}ms p95={latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
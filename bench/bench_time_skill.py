@@ -0,0 +1,29 @@
+# Fast-path benchmark for the time skill: python bench/bench_time_skill.py
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from skills.time_skill import _format_now, _normalize, _parse_format_spec
+
+
+def main() -> None:
+    samples = [
+        "what is the time right now",
+        "time in 24 hour format",
+        "current time with seconds",
+        "time now, no am/pm",
+        "24h without seconds please",
+    ]
+    for sample in samples:
+        print(f"{sample!r:40} -> {_parse_format_spec(_normalize(sample))}")
+
+    n = 20000
+    secs = timeit.timeit(lambda: [_format_now(datetime.now(), _parse_format_spec(_normalize(x))) for x in samples], number=n)
+    print(f"\n{n * len(samples)} requests in {secs:.3f}s -> {secs / (n * len(samples)) * 1e6:.1f} µs/request (no LLM)")
+
+
+if __name__ == "__main__":
+    main()
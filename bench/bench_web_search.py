@@ -0,0 +1,43 @@
+# Cache / single-flight / deadline benchmark with a fake slow provider: python bench/bench_web_search.py
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import web_search
+from web_search import web_search as search
+
+
+def main() -> None:
+    calls = []
+
+    def slow_provider(query, max_results):
+        calls.append(query)
+        time.sleep(0.2)
+        return [{"title": f"{query} #{i}", "href": f"https://example.com/{i}", "body": "..."} for i in range(max_results)]
+
+    web_search.set_provider(slow_provider)
+    queries = ["usd to pkr rate", "USD to PKR rate?", "latest news", "who wrote hamlet"] * 25
+
+    start = time.perf_counter()
+    list(ThreadPoolExecutor(max_workers=32).map(search, queries))
+    elapsed = time.perf_counter() - start
+    print(f"{len(queries)} searches in {elapsed:.2f}s, provider calls: {len(calls)}")
+    print(web_search.cache_stats())
+
+    def hanging_provider(query, max_results):
+        time.sleep(5)
+        return []
+
+    web_search.expire_cache()
+    web_search.set_provider(hanging_provider, keep_cache=True)  # the stale results must survive the swap
+    start = time.perf_counter()
+    out = search("latest news", deadline=0.3)
+    print(f"hung provider: answered in {time.perf_counter() - start:.2f}s from stale cache ({len(out)} chars)")
+    web_search.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,305 @@
 import os
+import ast
+import time
+import inspect
+import threading
 import importlib.util
-from typing import Callable, Dict, Any
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
 SkillFn = Callable[..., str]
 
-def load_skills(skills_dir: str = "skills") -> Dict[str, SkillFn]:
-    registry: Dict[str, SkillFn] = {}
+# Skills are registered from a static read of each file (COMMAND, ALIAS, DESCRIPTION,
+# PRIORITY) and imported on first call. With JARVIS_SKILLS_HOT_RELOAD=1 a changed file
+# is re-imported and swapped in; calls already running keep the version they started with.
+# (Changing COMMAND/ALIAS, or adding a skill file, still needs a restart.)
+HOT_RELOAD = os.getenv("JARVIS_SKILLS_HOT_RELOAD", "0").lower() in {"1", "true", "yes"}
+RELOAD_CHECK_SECONDS = float(os.getenv("JARVIS_SKILLS_RELOAD_CHECK_SECONDS", "1.0"))
+
+
+class SkillStats:
+    """Call-count and latency counters for one skill (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = self.total_seconds / self.calls if self.calls else 0.0
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_ms": round(avg * 1000, 3),
+                "max_ms": round(self.max_seconds * 1000, 3),
+            }
+
+
+def make_adapter(fn: SkillFn) -> Callable[[str, Dict[str, Any]], str]:
+    """
+    Inspect a skill's signature once and return adapter(arg, ctx).
+    run(arg, ctx) gets the ctx dict; run(arg, session_id=..., llm=...) gets keywords.
+    """
+    params = inspect.signature(fn).parameters
+    if len(params) == 2:
+        return fn
+
+    wanted = [name for name in ("session_id", "llm") if name in params]
+
+    def adapter(arg: str, ctx: Dict[str, Any]) -> str:
+        return fn(arg, **{name: ctx.get(name) for name in wanted})
+
+    return adapter
+
+
+class SkillLoader:
+    """Imports one skill file on first use and hot-swaps it when the file changes."""
+
+    def __init__(self, path: str, module_name: str):
+        self.path = path
+        self.module_name = module_name
+        self._lock = threading.Lock()
+        # (mtime_ns, run, adapter) - replaced as a whole so readers never see a mix
+        self._state = None
+        self._next_check = 0.0
+        self.error: Optional[str] = None  # set while the module cannot be imported
+
+    def _mtime(self) -> int:
+        return os.stat(self.path).st_mtime_ns
+
+    def _import(self):
+        mtime = self._mtime()
+        mod = _load_module(self.path, self.module_name)
+        fn = getattr(mod, "run", None) if mod else None
+        if not callable(fn):
+            raise ImportError(f"{self.path} has no run()")
+        return mtime, fn, make_adapter(fn)
+
+    def _stale(self, state) -> bool:
+        if not HOT_RELOAD:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + RELOAD_CHECK_SECONDS
+        try:
+            return self._mtime() != state[0]
+        except FileNotFoundError:
+            return False
+
+    def _unavailable(self, arg: str, ctx: Dict[str, Any]) -> str:
+        return f"❌ {ctx.get('command') or 'This command'} is unavailable: {self.error}"
+
+    def resolve(self):
+        state = self._state
+        if state is not None and not self._stale(state):
+            return state
+        with self._lock:
+            if self._state is not None and self._state is not state:
+                return self._state  # another thread already (re)loaded it
+            name = os.path.basename(self.path)
+            try:
+                self._state = self._import()
+                self.error = None
+                if state is not None:
+                    print(f" Reloaded skill: {name}")
+            except Exception as e:
+                try:
+                    mtime = self._mtime()
+                except OSError:
+                    mtime = 0
+                if state is None or state[1] is None:
+                    # never imported: answer with an error until the file is fixed (hot reload) or restart
+                    print(f" Skill {name} is unavailable: {type(e).__name__}: {e}")
+                    self.error = f"{type(e).__name__}: {e}"
+                    self._state = (mtime, None, self._unavailable)
+                else:
+                    print(f" Keeping previous {name}, reload failed: {e}")
+                    self._state = (mtime, state[1], state[2])
+            return self._state
+
+    def loaded(self) -> bool:
+        return self._state is not None and self.error is None
+
+    def __call__(self, arg: str, ctx: Dict[str, Any]) -> str:
+        return self.resolve()[2](arg, ctx)
+
+
+@dataclass(frozen=True)
+class SkillSpec:
+    command: str              # primary COMMAND of the module
+    module: str
+    call: Callable[[str, Dict[str, Any]], str] = field(repr=False)
+    description: str = ""
+    priority: int = 0
+    aliases: Tuple[str, ...] = ()
+    stats: SkillStats = field(default_factory=SkillStats, repr=False, compare=False)
+
+    @property
+    def available(self) -> bool:
+        return getattr(self.call, "error", None) is None
+
+    @property
+    def fn(self) -> SkillFn:
+        if isinstance(self.call, SkillLoader):
+            return self.call.resolve()[1]
+        return self.call
+
+    def __call__(self, arg: str, ctx: Dict[str, Any]) -> str:
+        start = time.perf_counter()
+        ok = False
+        try:
+            out = self.call(arg, ctx)
+            ok = self.available
+            return out
+        finally:
+            self.stats.record(time.perf_counter() - start, ok)
+
+
+class SkillTable(Mapping):
+    """Read-only command -> SkillSpec table built by load_skills."""
+
+    def __init__(self, table: Dict[str, SkillSpec], specs: Optional[List[SkillSpec]] = None):
+        self._table = dict(table)
+        self.commands: Tuple[str, ...] = tuple(self._table)
+        # every loaded skill file, including ones that lost all their commands to a conflict
+        self._specs: Tuple[SkillSpec, ...] = tuple(specs) if specs is not None else tuple(
+            {id(s): s for s in self._table.values()}.values()
+        )
+
+    def __getitem__(self, cmd: str) -> SkillSpec:
+        return self._table[cmd]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def available_commands(self) -> Tuple[str, ...]:
+        """Commands minus those whose skill failed to import (what /help shows)."""
+        return tuple(cmd for cmd in self.commands if self._table[cmd].available)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per skill file (two files may declare the same COMMAND)."""
+        out = {}
+        for spec in self._specs:
+            out[spec.module] = {
+                "command": spec.command,
+                "active": self._table.get(spec.command) is spec,
+                "description": spec.description,
+                "priority": spec.priority,
+                "aliases": list(spec.aliases),
+                "loaded": spec.call.loaded() if isinstance(spec.call, SkillLoader) else True,
+                "available": spec.available,
+                **spec.stats.snapshot(),
+            }
+        return out
+
+
+def _load_module(path: str, module_name: str):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    if not spec or not spec.loader:
+        return None
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """
+    COMMAND / ALIAS / DESCRIPTION / PRIORITY of a skill file, read from its AST
+    without importing it. Returns {} if the file is not a skill.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    manifest: Dict[str, Any] = {}
+    has_run = False
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "run":
+            has_run = True
+        targets = []
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        for t in targets:
+            if isinstance(t, ast.Name) and t.id in {"COMMAND", "ALIAS", "DESCRIPTION", "PRIORITY"}:
+                try:
+                    manifest[t.id] = ast.literal_eval(value)
+                except ValueError:
+                    pass  # not a literal; treated as missing
+
+    if not has_run or not isinstance(manifest.get("COMMAND"), str):
+        return {}
+    manifest["DOC"] = ast.get_docstring(tree) or ""
+    return manifest
+
+
+def _spec_from_manifest(manifest: Dict[str, Any], file: str, loader: SkillLoader) -> SkillSpec:
+    aliases = manifest.get("ALIAS", [])
+    aliases = tuple(a for a in aliases if isinstance(a, str)) if isinstance(aliases, list) else ()
+    description = manifest.get("DESCRIPTION") or manifest["DOC"].strip().split("\n")[0]
+    priority = manifest.get("PRIORITY", 0)
+
+    return SkillSpec(
+        command=manifest["COMMAND"],
+        module=file,
+        call=loader,
+        description=description if isinstance(description, str) else "",
+        priority=priority if isinstance(priority, int) else 0,
+        aliases=aliases,
+    )
+
+
+def _build_table(specs: List[SkillSpec]) -> SkillTable:
+    """
+    Resolve every command/alias to one skill and report conflicts.
+    Higher PRIORITY wins; on a tie a primary COMMAND beats an ALIAS, then file name order.
+    """
+    claims: Dict[str, List[Tuple[Tuple[int, bool, int], SkillSpec]]] = {}
+    for order, spec in enumerate(specs):
+        for name in dict.fromkeys((spec.command, *spec.aliases)):
+            rank = (spec.priority, name == spec.command, -order)
+            claims.setdefault(name, []).append((rank, spec))
+
+    table: Dict[str, SkillSpec] = {}
+    for name, claimants in claims.items():
+        claimants.sort(key=lambda c: c[0], reverse=True)
+        winner = claimants[0][1]
+        table[name] = winner
+        if name == winner.command:
+            print(f" Loaded skill: {name} from {winner.module}")
+        else:
+            print(f" Alias: {name} -> {winner.command}")
+        if len(claimants) > 1:
+            losers = ", ".join(c[1].module for c in claimants[1:])
+            print(f" Conflict: {name} claimed by {winner.module} and {losers}; using {winner.module}")
+    return SkillTable(table, specs)
+
+
+def load_skills(skills_dir: str = "skills") -> SkillTable:
     base_path = os.path.join(os.path.dirname(__file__), skills_dir)
 
     if not os.path.isdir(base_path):
         print(f" Skills dir not found: {base_path}")
-        return registry
+        return SkillTable({})
 
-    for file in os.listdir(base_path):
+    specs: List[SkillSpec] = []
+    for file in sorted(os.listdir(base_path)):
         if not file.endswith(".py"):
             continue
         if file.startswith("_") or file == "__init__.py":
@@ -22,33 +309,14 @@ def load_skills(skills_dir: str = "skills") -> Dict[str, SkillFn]:
         module_name = f"{skills_dir}.{file[:-3]}"
 
         try:
-            spec = importlib.util.spec_from_file_location(module_name, path)
-            if not spec or not spec.loader:
-                continue
-
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-
-            if not hasattr(mod, "COMMAND") or not hasattr(mod, "run"):
-                continue
-
-            cmd = getattr(mod, "COMMAND")
-            fn = getattr(mod, "run")
-
-            if isinstance(cmd, str) and callable(fn):
-                registry[cmd] = fn
-                print(f" Loaded skill: {cmd} from {file}")
-
-                aliases = getattr(mod, "ALIAS", [])
-                if isinstance(aliases, list):
-                    for a in aliases:
-                        if isinstance(a, str):
-                            registry[a] = fn
-                            print(f" Alias: {a} -> {cmd}")
-
-        except Exception as e:
-            print(f" Skipping {file} due to import error: {e}")
+            manifest = read_manifest(path)
+        except (OSError, SyntaxError, UnicodeDecodeError) as e:
+            print(f" Skipping {file}: {e}")
+            continue
+        if manifest:
+            specs.append(_spec_from_manifest(manifest, file, SkillLoader(path, module_name)))
 
+    registry = _build_table(specs)
     print(" Skills registered:", list(registry.keys()))
     return registry
 
@@ -73,7 +341,7 @@ def route_command(text: str, skills, session_id: str, llm=None):
     ctx: Dict[str, Any] = {
         "session_id": session_id,
         "command": cmd,
-        "commands": list(skills.keys()),
+        "commands": skills.available_commands() if hasattr(skills, "available_commands") else list(skills.keys()),
         "llm": llm,
     }
     return fn(arg, ctx)
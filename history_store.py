@@ -0,0 +1,242 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+import os
+import threading
+import time
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_community.chat_message_histories import ChatMessageHistory
+
+from rag_index import estimate_tokens
+
+# Bounded conversation history.
+# - sessions are kept in LRU order; idle ones expire after HISTORY_TTL_SECONDS
+# - total stored text is capped at HISTORY_MAX_CHARS across all sessions
+# - what goes into a prompt is trimmed to HISTORY_TOKEN_BUDGET, newest turns first;
+#   older turns are replaced by a rolling summary when a summarizer is configured
+
+HISTORY_MAX_SESSIONS = int(os.getenv("JARVIS_HISTORY_MAX_SESSIONS", "1000"))
+HISTORY_MAX_CHARS = int(os.getenv("JARVIS_HISTORY_MAX_CHARS", str(20_000_000)))
+HISTORY_MAX_MESSAGES = int(os.getenv("JARVIS_HISTORY_MAX_MESSAGES", "200"))
+HISTORY_TTL_SECONDS = float(os.getenv("JARVIS_HISTORY_TTL_SECONDS", str(6 * 3600)))
+HISTORY_TOKEN_BUDGET = int(os.getenv("JARVIS_HISTORY_TOKEN_BUDGET", "2000"))
+# re-summarize once this many turns have fallen out of the budget since the last summary
+SUMMARY_EVERY = int(os.getenv("JARVIS_HISTORY_SUMMARY_EVERY", "6"))
+
+# (previous_summary, messages_to_fold_in) -> new summary
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+
+def _msg_chars(m: BaseMessage) -> int:
+    return len(m.content) if isinstance(m.content, str) else len(str(m.content))
+
+
+class _Session:
+    __slots__ = ("history", "chars", "last_used", "summary", "summary_upto", "summarizing", "trimmed")
+
+    def __init__(self):
+        self.history = ChatMessageHistory()
+        self.chars = 0
+        self.last_used = time.monotonic()
+        self.summary = ""
+        self.summary_upto = 0      # messages[:summary_upto] are covered by summary
+        self.summarizing = False
+        self.trimmed = 0           # messages dropped from the front so far; shifts indexes taken earlier
+
+
+class BudgetedHistory(BaseChatMessageHistory):
+    """
+    What RunnableWithMessageHistory sees for one session: reads are trimmed to the
+    token budget, writes go to the bounded store.
+    """
+
+    def __init__(self, manager: "HistoryManager", session_id: str, token_budget: int):
+        self._manager = manager
+        self._session_id = session_id
+        self._token_budget = token_budget
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._manager.prompt_messages(self._session_id, self._token_budget)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._manager.add_messages(self._session_id, messages)
+
+    def clear(self) -> None:
+        self._manager.pop(self._session_id)
+
+
+class HistoryManager:
+    def __init__(
+        self,
+        max_sessions: int = HISTORY_MAX_SESSIONS,
+        max_chars: int = HISTORY_MAX_CHARS,
+        max_messages: int = HISTORY_MAX_MESSAGES,
+        ttl_seconds: float = HISTORY_TTL_SECONDS,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+
+        self._lock = threading.RLock()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._total_chars = 0
+        self._summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+    # store
+
+    def _touch(self, session_id: str) -> _Session:
+        now = time.monotonic()
+        sess = self._sessions.get(session_id)
+        if sess is not None and now - sess.last_used > self.ttl_seconds:
+            self._drop(session_id)
+            sess = None
+        if sess is None:
+            sess = _Session()
+            self._sessions[session_id] = sess
+        sess.last_used = now
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) > self.max_sessions:
+            self._evict(keep=session_id)
+        return sess
+
+    def _drop(self, session_id: str) -> None:
+        sess = self._sessions.pop(session_id, None)
+        if sess is not None:
+            self._total_chars -= sess.chars
+
+    def _evict(self, keep: str) -> None:
+        now = time.monotonic()
+        # idle sessions first (oldest are at the front)
+        for sid in list(self._sessions):
+            if sid == keep or now - self._sessions[sid].last_used <= self.ttl_seconds:
+                break
+            self._drop(sid)
+        # then least recently used until under both caps
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_chars > self.max_chars
+        ):
+            sid = next(iter(self._sessions))
+            if sid == keep:
+                self._sessions.move_to_end(sid)
+                sid = next(iter(self._sessions))
+            self._drop(sid)
+
+    def get(self, session_id: str) -> BudgetedHistory:
+        return BudgetedHistory(self, session_id, self.token_budget)
+
+    def pop(self, session_id: str) -> None:
+        with self._lock:
+            self._drop(session_id)
+
+    def add_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            sess = self._touch(session_id)
+            sess.history.add_messages(messages)
+            added = sum(_msg_chars(m) for m in messages)
+            sess.chars += added
+            self._total_chars += added
+
+            # per-session cap: forget the oldest messages outright
+            overflow = len(sess.history.messages) - self.max_messages
+            if overflow > 0:
+                dropped = sess.history.messages[:overflow]
+                del sess.history.messages[:overflow]
+                freed = sum(_msg_chars(m) for m in dropped)
+                sess.chars -= freed
+                self._total_chars -= freed
+                sess.summary_upto = max(0, sess.summary_upto - overflow)
+                sess.trimmed += overflow
+
+            self._evict(keep=session_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "chars": self._total_chars}
+
+    # prompt view
+
+    def prompt_messages(self, session_id: str, token_budget: Optional[int] = None) -> List[BaseMessage]:
+        """Newest whole turns that fit the token budget, preceded by the rolling summary if there is one."""
+        budget = self.token_budget if token_budget is None else token_budget
+        with self._lock:
+            sess = self._touch(session_id)
+            messages = list(sess.history.messages)
+            summary, summary_upto, trimmed = sess.summary, sess.summary_upto, sess.trimmed
+
+        summary_msg = SystemMessage(content=f"Summary of earlier conversation:\n{summary}") if summary else None
+        used = estimate_tokens(summary_msg.content) if summary_msg else 0
+
+        # whole turns only: a human message and the replies after it go in or out together
+        start = len(messages)
+        while start > 0:
+            turn = start - 1
+            while turn > 0 and messages[turn].type != "human":
+                turn -= 1
+            cost = sum(estimate_tokens(str(m.content)) for m in messages[turn:start])
+            if used + cost > budget:
+                break
+            used += cost
+            start = turn
+
+        kept = messages[start:]
+        if start == 0:
+            return kept
+
+        # messages[:start] fell out of the budget
+        if self.summarizer is not None and start - summary_upto >= SUMMARY_EVERY:
+            self._schedule_summary(session_id, start, trimmed)
+        return ([summary_msg] if summary_msg else []) + kept
+
+    def _schedule_summary(self, session_id: str, upto: int, trimmed: int) -> None:
+        # upto indexes the messages as they were when `trimmed` messages had been dropped
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is None or sess.summarizing:
+                return
+            upto -= sess.trimmed - trimmed
+            if upto <= sess.summary_upto:
+                return
+            sess.summarizing = True
+            prev, fold = sess.summary, list(sess.history.messages[sess.summary_upto:upto])
+            trimmed = sess.trimmed
+        # runs off the request path; the previous summary is used until this lands
+        self._summary_pool.submit(self._summarize, session_id, sess, prev, fold, upto, trimmed)
+
+    def _summarize(
+        self, session_id: str, sess: _Session, prev: str, fold: List[BaseMessage], upto: int, trimmed: int
+    ) -> None:
+        try:
+            summary = self.summarizer(prev, fold)
+        except Exception as e:
+            print(f" History summary failed for {session_id}: {e}")
+            summary = None
+        with self._lock:
+            sess.summarizing = False
+            if summary and self._sessions.get(session_id) is sess:
+                sess.summary = summary.strip()
+                # messages trimmed while the summarizer ran moved everything forward
+                sess.summary_upto = max(0, upto - (sess.trimmed - trimmed))
+
+
+def llm_summarizer(llm) -> Summarizer:
+    def summarize(prev: str, messages: List[BaseMessage]) -> str:
+        turns = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        prompt = (
+            "Update the running summary of a conversation with the new turns below.\n"
+            "Keep facts, names, decisions and open questions. Max 150 words.\n\n"
+            f"Current summary:\n{prev or '(none)'}\n\n"
+            f"New turns:\n{turns}\n\n"
+            "Updated summary:"
+        )
+        res = llm.invoke(prompt)
+        return res.content if hasattr(res, "content") else str(res)
+    return summarize
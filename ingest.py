@@ -0,0 +1,160 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from rag_pdf import index_pdf, sync_vectors
+from rag_store import RAG_DIR, atomic_write
+
+# Background PDF ingestion.
+# Upload returns a job id at once; extraction + indexing run on a bounded pool.
+# Job status is kept on disk next to the RAG store so any worker can answer
+# /upload_status, and the session's active PDF only switches once index_pdf finishes.
+# While a worker holds unfinished jobs it touches their files every _HEARTBEAT_EVERY
+# seconds; a queued/running job whose file goes untouched for JOB_STALE_SECONDS lost
+# its worker and is reported as failed. Job files older than JOB_TTL_SECONDS are deleted.
+
+INGEST_WORKERS = int(os.getenv("JARVIS_INGEST_WORKERS", "2"))
+JOB_TTL_SECONDS = float(os.getenv("JARVIS_INGEST_JOB_TTL", "3600"))
+JOB_STALE_SECONDS = float(os.getenv("JARVIS_INGEST_JOB_STALE", "120"))
+JOBS_DIR = RAG_DIR / "_jobs"
+_PROGRESS_EVERY = 0.5  # seconds between progress writes
+_HEARTBEAT_EVERY = max(1.0, JOB_STALE_SECONDS / 4)
+
+_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_lock = threading.Lock()
+_JOBS: Dict[str, Dict[str, Any]] = {}
+_heartbeat: Optional[threading.Thread] = None
+
+
+def _job_path(job_id: str):
+    return JOBS_DIR / f"{job_id}.json"
+
+def _save(job: Dict[str, Any]) -> None:
+    with _lock:
+        if job["status"] in {"done", "error"}:
+            # finished jobs are served from disk
+            _JOBS.pop(job["job_id"], None)
+        else:
+            _JOBS[job["job_id"]] = dict(job)
+    atomic_write(_job_path(job["job_id"]), json.dumps(job).encode("utf-8"))
+
+
+def _run(job: Dict[str, Any], file_path: str, content_hash: Optional[str]) -> None:
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    _save(job)
+
+    last = 0.0
+
+    def progress(done: int, total: int) -> None:
+        nonlocal last
+        job["pages_done"] = done
+        job["pages_total"] = total
+        now = time.monotonic()
+        if now - last >= _PROGRESS_EVERY or done == total:
+            last = now
+            _save(job)
+
+    try:
+        chunks = index_pdf(
+            session_id=job["session_id"],
+            file_path=file_path,
+            source_id=job["filename"],
+            progress=progress,
+            content_hash=content_hash,
+        )
+        job["status"] = "done"
+        job["chunks_indexed"] = chunks
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+    job["finished_at"] = time.time()
+    _save(job)
+
+
+def _sweep() -> None:
+    # delete job files nobody has touched for JOB_TTL_SECONDS (finished, or long dead)
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for path in JOBS_DIR.glob("*.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            continue
+
+
+def _beat() -> None:
+    last_sweep = 0.0
+    while True:
+        time.sleep(_HEARTBEAT_EVERY)
+        with _lock:
+            live = list(_JOBS)
+        for job_id in live:
+            try:
+                os.utime(_job_path(job_id))
+            except FileNotFoundError:
+                pass
+        if time.monotonic() - last_sweep >= JOB_TTL_SECONDS / 4:
+            last_sweep = time.monotonic()
+            _sweep()
+
+
+def _start_heartbeat() -> None:
+    global _heartbeat
+    with _lock:
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="ingest-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+def submit(session_id: str, file_path: str, filename: str, content_hash: Optional[str] = None) -> str:
+    job_id = uuid.uuid4().hex
+    job = {
+        "job_id": job_id,
+        "session_id": session_id,
+        "filename": filename,
+        "status": "queued",
+        "pages_done": 0,
+        "pages_total": None,
+        "chunks_indexed": None,
+        "error": None,
+        "created_at": time.time(),
+    }
+    _save(job)
+    _start_heartbeat()
+    _pool.submit(_run, job, file_path, content_hash)
+    return job_id
+
+
+def submit_vector_sync(session_id: str, source_id: str) -> None:
+    """Embed an already attached document (cached re-upload) on the ingest pool."""
+    _pool.submit(sync_vectors, session_id, source_id)
+
+
+def get_status(job_id: str) -> Optional[Dict[str, Any]]:
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id or ""):
+        return None
+    with _lock:
+        job = _JOBS.get(job_id)
+    if job is not None:
+        return dict(job)
+    # job may belong to another worker process
+    path = _job_path(job_id)
+    try:
+        mtime = path.stat().st_mtime
+        job = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if job.get("status") in {"queued", "running"} and time.time() - mtime > JOB_STALE_SECONDS:
+        # the worker that owned it stopped without finishing; don't leave clients polling forever
+        job["status"] = "error"
+        job["error"] = "Indexing was interrupted (the server worker stopped). Please upload the PDF again."
+        job["finished_at"] = time.time()
+        atomic_write(path, json.dumps(job).encode("utf-8"))
+    return job
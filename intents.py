@@ -0,0 +1,102 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+import json
+import os
+
+from rag_index import tokenize as _words
+
+# One-pass intent matcher for routing.
+# Every trigger phrase is matched on whole words, so "now" does not fire on "know"
+# and "cv" does not fire inside other words. A message is tokenized once and every
+# trigger set is checked in the same pass; classify() returns all matched intents.
+#
+# Trigger sets can be extended or replaced with a JSON file named by
+# JARVIS_INTENT_TRIGGERS, e.g. {"web": ["weather", "score"], "time": null}
+# (a list extends the default set, null removes it, {"replace": [...]} replaces it).
+
+DEFAULT_TRIGGERS: Dict[str, List[str]] = {
+    "time": [
+        "time", "current time", "time right now", "what time is it", "what is the time",
+        "time now", "date", "today's date", "current date",
+    ],
+    "web": [
+        "current", "latest", "today", "now", "news", "price", "rate", "exchange",
+        "usd", "pkr", "who is the current", "president", "prime minister",
+        "cm of", "chief minister", "updated", "2024", "2025", "2026",
+    ],
+    "pdf": [
+        "this pdf", "this document", "this file", "uploaded pdf", "uploaded document",
+        "resume", "cv", "in the pdf", "from the pdf", "from this document",
+    ],
+}
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Lowercase word tokens as the matcher sees them (same as rag_index): "Today's" -> ("today", "s")."""
+    return tuple(_words(text))
+
+
+class IntentMatcher:
+    """
+    Phrase table keyed by word tuples; matching is one scan over the message's words.
+    classify() results are memoized for cache_size messages (0 = no cache).
+    """
+
+    def __init__(self, trigger_sets: Dict[str, Iterable[str]], cache_size: int = 4096):
+        self.trigger_sets = {name: list(phrases) for name, phrases in trigger_sets.items()}
+        acc: Dict[Tuple[str, ...], set] = {}
+        for name, phrases in self.trigger_sets.items():
+            for phrase in phrases:
+                key = tokenize(phrase)
+                if key:
+                    acc.setdefault(key, set()).add(name)
+        self._table: Dict[Tuple[str, ...], FrozenSet[str]] = {k: frozenset(v) for k, v in acc.items()}
+        # first word -> longest phrase starting with it; most words start nothing
+        self._starts: Dict[str, int] = {}
+        for k in self._table:
+            self._starts[k[0]] = max(self._starts.get(k[0], 0), len(k))
+        self.classify = lru_cache(maxsize=cache_size)(self._classify) if cache_size else self._classify
+
+    def _classify(self, text: str) -> FrozenSet[str]:
+        words = tokenize(text)
+        table, starts = self._table, self._starts
+        found: set = set()
+        for i, w in enumerate(words):
+            longest = starts.get(w)
+            if not longest:
+                continue
+            for n in range(1, min(longest, len(words) - i) + 1):
+                hit = table.get(words[i:i + n])
+                if hit:
+                    found |= hit
+        return frozenset(found)
+
+
+def _load_triggers() -> Dict[str, List[str]]:
+    triggers = {name: list(phrases) for name, phrases in DEFAULT_TRIGGERS.items()}
+    path = os.getenv("JARVIS_INTENT_TRIGGERS")
+    if not path:
+        return triggers
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            custom = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f" Ignoring intent triggers file {path}: {e}")
+        return triggers
+
+    for name, value in custom.items():
+        if value is None:
+            triggers.pop(name, None)
+        elif isinstance(value, dict) and isinstance(value.get("replace"), list):
+            triggers[name] = list(value["replace"])
+        elif isinstance(value, list):
+            triggers.setdefault(name, []).extend(value)
+    return triggers
+
+
+matcher = IntentMatcher(_load_triggers())
+
+
+def classify(text: str) -> FrozenSet[str]:
+    """Every intent whose triggers appear in text (as whole words), e.g. frozenset({"time", "web"})."""
+    return matcher.classify((text or "").strip())
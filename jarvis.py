@@ -3,12 +3,12 @@ from dotenv import load_dotenv
 
 from brain import load_skills, route_command
 from auto_router import auto_route
-from memory_store import get_memories
+from memory_store import memory_context
+from history_store import HistoryManager, BudgetedHistory, llm_summarizer
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
 
 # Setup
 load_dotenv()
@@ -39,12 +39,11 @@ chain = prompt | llm
 
 # Memory 
 
-_store = {}
+# bounded per-session history; prompts get the newest turns that fit the token budget
+histories = HistoryManager(summarizer=llm_summarizer(llm))
 
-def get_history(session_id: str) -> ChatMessageHistory:
-    if session_id not in _store:
-        _store[session_id] = ChatMessageHistory()
-    return _store[session_id]
+def get_history(session_id: str) -> BudgetedHistory:
+    return histories.get(session_id)
 
 jarvis = RunnableWithMessageHistory(
     chain,
@@ -77,7 +76,7 @@ def main():
         cmd_result = route_command(user_text, skills, SESSION_ID)
 
         if cmd_result == "__CLEAR_CHAT__":
-            _store.pop(SESSION_ID, None)
+            histories.pop(SESSION_ID)
             print("Jarvis:  Chat history cleared.\n")
             continue
 
@@ -91,12 +90,9 @@ def main():
             print(f"Jarvis: {auto_result}\n")
             continue
 
-        # 3) Normal chat (inject saved memory into prompt)
-        memory_items = get_memories(SESSION_ID)
-        memory_context = "\n".join(f"- {m}" for m in memory_items) if memory_items else "No saved memory yet."
-
+        # 3) Normal chat (inject the saved memories relevant to this message)
         res = jarvis.invoke(
-            {"input": user_text, "memory_context": memory_context},
+            {"input": user_text, "memory_context": memory_context(SESSION_ID, user_text)},
             config=CFG
         )
         print(f"Jarvis: {res.content}\n")
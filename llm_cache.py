@@ -0,0 +1,148 @@
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from rag_store import atomic_write
+
+# LLM answer cache for the pdf and web routes.
+# Keys are digests of everything that determines the answer (document content,
+# retrieved chunk ids, normalized question, model), so a hit is always safe to reuse.
+# Memory tier: LRU bounded by LLM_CACHE_SIZE entries with a TTL.
+# Optional disk tier (JARVIS_LLM_CACHE_DIR) shared by workers and restarts.
+
+LLM_CACHE_SIZE = int(os.getenv("JARVIS_LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.getenv("JARVIS_LLM_CACHE_TTL", "3600"))
+LLM_CACHE_DIR = os.getenv("JARVIS_LLM_CACHE_DIR", "")
+LLM_CACHE_DISK_SIZE = int(os.getenv("JARVIS_LLM_CACHE_DISK_SIZE", "10000"))
+_DISK_PRUNE_EVERY = 100  # puts between disk size checks
+
+
+def normalize_question(text: str) -> str:
+    t = (text or "").lower().strip()
+    t = re.sub(r"\s+", " ", t)
+    return t.rstrip(" ?!.")
+
+
+def model_name(llm) -> str:
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
+
+
+def make_key(kind: str, *parts: Any) -> str:
+    h = hashlib.sha256(kind.encode("utf-8"))
+    for part in parts:
+        h.update(b"\x00")
+        h.update(json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_SIZE,
+        ttl: float = LLM_CACHE_TTL,
+        disk_dir: str = LLM_CACHE_DIR,
+        max_disk_entries: int = LLM_CACHE_DISK_SIZE,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._puts = 0
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, answer)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            entry = json.loads(self._disk_path(key).read_text(encoding="utf-8"))
+            return float(entry["expires_at"]), entry["answer"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _disk_put(self, key: str, expires_at: float, answer: str) -> None:
+        path = self._disk_path(key)
+        try:
+            atomic_write(path, json.dumps({"expires_at": expires_at, "answer": answer}, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            print(f" LLM cache disk write failed: {e}")
+
+    def _disk_prune(self) -> None:
+        # least recently written first (disk hits are promoted to memory, not re-written)
+        files = []
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_disk_entries)]:
+            path.unlink(missing_ok=True)
+
+    def _remember(self, key: str, expires_at: float, answer: str) -> None:
+        self._mem[key] = (expires_at, answer)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._mem[key]
+
+        if self.disk_dir is not None:
+            entry = self._disk_get(key)
+            if entry is not None and entry[0] > now:
+                with self._lock:
+                    self._remember(key, *entry)
+                    self.disk_hits += 1
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, answer: str) -> None:
+        if not answer:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, answer)
+            self._puts += 1
+            prune = self._puts % _DISK_PRUNE_EVERY == 0
+        if self.disk_dir is not None:
+            self._disk_put(key, expires_at, answer)
+            if prune:
+                self._disk_prune()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._mem),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+# shared by ask_pdf and the server's web route
+responses = ResponseCache()
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+# One cap on concurrent upstream LLM calls for the whole process.
+# The server's final answer runs on the event loop (ainvoke / astream), while
+# skills (/pdf, /recall, /time), auto-routed PDF answers and the history
+# summarizer call llm.invoke from worker threads; all of them take a slot here.
+
+
+class LLMLimiter:
+    """`with limiter:` in threads, `async with limiter:` on the event loop; both share the same slots."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def __enter__(self):
+        self._slots.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    async def __aenter__(self):
+        # never block the event loop on a thread semaphore (and never leave a waiter
+        # thread behind that would take a slot after its task was cancelled)
+        delay = 0.005
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
+
+
+class LimitedLLM:
+    """Wraps a chat model so every call goes through the limiter; other attributes pass through."""
+
+    def __init__(self, llm, limiter: LLMLimiter):
+        self._llm = llm
+        self._limiter = limiter
+
+    def invoke(self, *args, **kwargs):
+        with self._limiter:
+            return self._llm.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        async with self._limiter:
+            return await self._llm.ainvoke(*args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        with self._limiter:
+            yield from self._llm.stream(*args, **kwargs)
+
+    async def astream(self, *args, **kwargs):
+        async with self._limiter:
+            async for piece in self._llm.astream(*args, **kwargs):
+                yield piece
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
@@ -1,56 +1,421 @@
+import atexit
 import json
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from rag_index import BM25Index, estimate_tokens
+from rag_store import atomic_write
+from file_lock import FileLock
 
 DATA_FILE = "memory.json"
+JOURNAL_FILE = DATA_FILE + ".journal"
+JOURNAL_LOCK_FILE = JOURNAL_FILE + ".lock"
+LOCK_FILE = DATA_FILE + ".lock"
+DB_FILE = os.getenv("JARVIS_MEMORY_DB", "memory.db")
+
+# Storage backend, picked by JARVIS_MEMORY_BACKEND:
+#   sqlite (default) - SQLite in WAL mode, one indexed row per entry. Safe with many workers.
+#   file             - memory.json guarded by a lock file, replaced atomically. Safe with many workers.
+#   journal          - in-process cache + append-only journal. Fastest, but one process only:
+#                      it holds JOURNAL_LOCK_FILE while running and refuses to start if another
+#                      process (e.g. a second uvicorn worker) already has it.
+# sqlite and file pick up whatever is in memory.json (+ journal) the first time they run.
+BACKEND = os.getenv("JARVIS_MEMORY_BACKEND", "sqlite").lower()
+
+JOURNAL_SYNC_EVERY = int(os.getenv("JARVIS_JOURNAL_SYNC_EVERY", "32"))
+JOURNAL_SYNC_SECONDS = float(os.getenv("JARVIS_JOURNAL_SYNC_SECONDS", "1.0"))
+COMPACT_EVERY = int(os.getenv("JARVIS_JOURNAL_COMPACT_EVERY", "1000"))
+
+# how many saved memories go into a chat prompt, and how many tokens they may use
+MEMORY_TOP_K = int(os.getenv("JARVIS_MEMORY_TOP_K", "8"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("JARVIS_MEMORY_TOKEN_BUDGET", "300"))
+# sessions whose memory index is kept in this process (least recently used dropped)
+MEMORY_MAX_INDEXES = int(os.getenv("JARVIS_MEMORY_MAX_INDEXES", "256"))
+
+KINDS = ("memories", "notes")
 
 
-def _load():
+def _empty():
+    return {"memories": {}, "notes": {}}
+
+
+def _read_snapshot():
     if not os.path.exists(DATA_FILE):
-        return {"memories": {}, "notes": {}}
+        return _empty()
     with open(DATA_FILE, "r", encoding="utf-8") as f:
         data = json.load(f)
     # backward-safe defaults
     data.setdefault("memories", {})
     data.setdefault("notes", {})
+    # very old files kept notes as one flat list
+    if isinstance(data["notes"], list):
+        data["notes"] = {"default": data["notes"]} if data["notes"] else {}
     return data
 
 
-def _save(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def _apply(data, entry):
+    kind, session_id = entry["kind"], entry["session_id"]
+    if entry["op"] == "add":
+        data[kind].setdefault(session_id, []).append(entry["text"])
+    elif entry["op"] == "clear":
+        data[kind][session_id] = []
+
+
+def _replay_journal(data):
+    """Applies journal lines to data. Returns (lines_applied, torn)."""
+    lines = 0
+    if not os.path.exists(JOURNAL_FILE):
+        return 0, False
+    with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return lines, True  # half-written last line from a crash
+            _apply(data, entry)
+            lines += 1
+    return lines, False
+
+
+def _write_snapshot(data):
+    atomic_write(Path(DATA_FILE), json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+def _load_legacy():
+    """memory.json plus any journal lines, for migrating into another backend."""
+    data = _read_snapshot()
+    _replay_journal(data)
+    return data
+
+
+class JournalBackend:
+    """
+    Write-behind store:
+    - memory.json is the snapshot, loaded once into _data
+    - every write updates _data and appends one JSON line to the journal
+    - the journal is fsynced in batches (JOURNAL_SYNC_EVERY writes or JOURNAL_SYNC_SECONDS)
+    - after COMPACT_EVERY journal lines, _data is written back as a fresh snapshot
+    """
+
+    def __init__(self):
+        # held for the life of the process: other processes would never see our writes,
+        # and compaction would truncate journal lines they appended
+        self._owner = FileLock(JOURNAL_LOCK_FILE)
+        if not self._owner.acquire(blocking=False):
+            raise RuntimeError(
+                f"{JOURNAL_FILE} is in use by another process; the journal memory backend is "
+                "single-process only. Use JARVIS_MEMORY_BACKEND=sqlite with several workers."
+            )
+        self._lock = threading.RLock()
+        self._data = None
+        self._journal = None
+        self._journal_lines = 0
+        self._unsynced = 0
+        self._flusher = None
+
+    def _load(self):
+        if self._data is not None:
+            return self._data
+        data = _read_snapshot()
+        lines, torn = _replay_journal(data)
+        self._data, self._journal_lines = data, lines
+        if torn:
+            # fold what we could read into the snapshot so new lines don't follow the torn one
+            self._compact()
+        return self._data
+
+    def _sync(self):
+        if self._journal is not None and self._unsynced:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+
+    def _compact(self):
+        _write_snapshot(self._data)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        # snapshot now holds everything the journal did
+        with open(JOURNAL_FILE, "w", encoding="utf-8"):
+            pass
+        self._journal_lines = 0
+        self._unsynced = 0
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(JOURNAL_SYNC_SECONDS)
+            self.flush()
+
+    def _write(self, entry):
+        with self._lock:
+            _apply(self._load(), entry)
+
+            if self._journal is None:
+                self._journal = open(JOURNAL_FILE, "a", encoding="utf-8")
+            self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_lines += 1
+            self._unsynced += 1
+
+            if self._journal_lines >= COMPACT_EVERY:
+                self._compact()
+            elif self._unsynced >= JOURNAL_SYNC_EVERY:
+                self._sync()
+
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="memory-journal", daemon=True)
+                self._flusher.start()
+
+    def add(self, kind, session_id, text):
+        self._write({"op": "add", "kind": kind, "session_id": session_id, "text": text})
+
+    def clear(self, kind, session_id):
+        self._write({"op": "clear", "kind": kind, "session_id": session_id})
+
+    def get(self, kind, session_id):
+        with self._lock:
+            return list(self._load()[kind].get(session_id, []))
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+
+class FileBackend:
+    """
+    memory.json shared by several processes: each write is load-modify-save under
+    LOCK_FILE with an atomic replace. Reads reuse the parsed file until it changes.
+    """
+
+    def __init__(self):
+        self._flock = FileLock(LOCK_FILE)
+        self._cache_lock = threading.Lock()
+        self._cache = (None, None)  # (stat signature, data)
+        with self._flock:
+            # fold a leftover journal from the journal backend into the snapshot
+            if os.path.exists(JOURNAL_FILE) and os.path.getsize(JOURNAL_FILE):
+                _write_snapshot(_load_legacy())
+                with open(JOURNAL_FILE, "w", encoding="utf-8"):
+                    pass
+
+    def _read(self):
+        try:
+            st = os.stat(DATA_FILE)
+            sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            return _empty()
+        with self._cache_lock:
+            if self._cache[0] == sig:
+                return self._cache[1]
+        data = _read_snapshot()
+        with self._cache_lock:
+            self._cache = (sig, data)
+        return data
+
+    def _write(self, entry):
+        with self._flock:
+            data = _read_snapshot()
+            _apply(data, entry)
+            _write_snapshot(data)
+
+    def add(self, kind, session_id, text):
+        self._write({"op": "add", "kind": kind, "session_id": session_id, "text": text})
+
+    def clear(self, kind, session_id):
+        self._write({"op": "clear", "kind": kind, "session_id": session_id})
+
+    def get(self, kind, session_id):
+        return list(self._read()[kind].get(session_id, []))
+
+    def flush(self):
+        pass
+
+
+class SQLiteBackend:
+    """One row per entry, indexed by (kind, session_id). WAL lets readers run alongside a writer."""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        con = self._con()
+        with con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " session_id TEXT NOT NULL,"
+                " text TEXT NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS entries_by_session ON entries (kind, session_id, id)")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._migrate()
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA busy_timeout=30000")
+            self._local.con = con
+        return con
+
+    def _migrate(self):
+        con = self._con()
+        # BEGIN IMMEDIATE: only one worker migrates, the others wait and see the marker
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            done = con.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone()
+            if not done:
+                data = _load_legacy()
+                rows = [
+                    (kind, session_id, text)
+                    for kind in KINDS
+                    for session_id, items in data.get(kind, {}).items()
+                    for text in items
+                ]
+                con.executemany("INSERT INTO entries (kind, session_id, text) VALUES (?, ?, ?)", rows)
+                con.execute("INSERT INTO meta (key, value) VALUES ('migrated_json', ?)", (str(time.time()),))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def add(self, kind, session_id, text):
+        self._con().execute("INSERT INTO entries (kind, session_id, text) VALUES (?, ?, ?)", (kind, session_id, text))
+
+    def clear(self, kind, session_id):
+        self._con().execute("DELETE FROM entries WHERE kind = ? AND session_id = ?", (kind, session_id))
+
+    def get(self, kind, session_id):
+        rows = self._con().execute(
+            "SELECT text FROM entries WHERE kind = ? AND session_id = ? ORDER BY id", (kind, session_id)
+        )
+        return [r[0] for r in rows]
+
+    def flush(self):
+        pass
+
+
+_BACKENDS = {"journal": JournalBackend, "file": FileBackend, "sqlite": SQLiteBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _store():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if BACKEND not in _BACKENDS:
+                    raise ValueError(f"Unknown JARVIS_MEMORY_BACKEND: {BACKEND} (use one of {', '.join(_BACKENDS)})")
+                _backend = _BACKENDS[BACKEND]()
+    return _backend
+
+
+def flush():
+    """Force pending writes to disk."""
+    if _backend is not None:
+        _backend.flush()
+
+
+atexit.register(flush)
+
+# Per-session lexical index over memories.
+# add_memory extends it in place; reads re-check it against the stored list so
+# writes from other workers (or a clear) are picked up.
+_index_lock = threading.Lock()
+_mem_index = OrderedDict()  # session_id -> (BM25Index, indexed memories)
+
+
+def _memory_index(session_id, memories):
+    with _index_lock:
+        cached = _mem_index.get(session_id)
+        if cached is not None:
+            index, indexed = cached
+            n = len(indexed)
+            if len(memories) >= n and memories[:n] == indexed:
+                for m in memories[n:]:
+                    index.add(m)
+                    indexed.append(m)
+                _mem_index.move_to_end(session_id)
+                return index
+        index = BM25Index(memories)
+        _mem_index[session_id] = (index, list(memories))
+        _mem_index.move_to_end(session_id)
+        while len(_mem_index) > MEMORY_MAX_INDEXES:
+            _mem_index.popitem(last=False)
+        return index
+
+
+def rank_memories(session_id: str, text: str, k: int = MEMORY_TOP_K):
+    """[(bm25_score, memory), ...] best first; only memories sharing a term with text."""
+    memories = get_memories(session_id)
+    if not memories:
+        return []
+    return [(score, memories[i]) for score, i in _memory_index(session_id, memories).search(text, k=k)]
+
+
+def relevant_memories(session_id: str, text: str, k: int = MEMORY_TOP_K, token_budget: int = MEMORY_TOKEN_BUDGET):
+    """
+    The saved memories most relevant to text, best first, within token_budget.
+    Falls back to the newest memories when nothing matches lexically.
+    """
+    picked = [m for _, m in rank_memories(session_id, text, k=k)]
+    if not picked:
+        picked = get_memories(session_id)[::-1][:min(k, 3)]
+
+    out, used = [], 0
+    for m in picked:
+        cost = estimate_tokens(m)
+        if used + cost > token_budget:
+            continue
+        out.append(m)
+        used += cost
+    return out
+
+
+def memory_context(session_id: str, text: str) -> str:
+    """Prompt text for the relevant memories, or a note saying why there are none."""
+    items = relevant_memories(session_id, text)
+    if items:
+        return "\n".join(f"- {m}" for m in items)
+    if not get_memories(session_id):
+        return "No saved memory yet."
+    return "No saved memory is relevant to this message."
+
 
 # Memories (facts)
 def add_memory(session_id: str, text: str):
-    data = _load()
-    data["memories"].setdefault(session_id, [])
-    data["memories"][session_id].append(text.strip())
-    _save(data)
+    text = text.strip()
+    _store().add("memories", session_id, text)
+    with _index_lock:
+        cached = _mem_index.get(session_id)
+        if cached is not None:
+            cached[0].add(text)
+            cached[1].append(text)
 
 
 def get_memories(session_id: str):
-    data = _load()
-    return data["memories"].get(session_id, [])
+    return _store().get("memories", session_id)
 
 
 def clear_memories(session_id: str):
-    data = _load()
-    data["memories"][session_id] = []
-    _save(data)
+    _store().clear("memories", session_id)
+    with _index_lock:
+        _mem_index.pop(session_id, None)
 
-# Notes 
+# Notes
 def add_note(session_id: str, text: str):
-    data = _load()
-    data["notes"].setdefault(session_id, [])
-    data["notes"][session_id].append(text.strip())
-    _save(data)
+    _store().add("notes", session_id, text.strip())
 
 
 def get_notes(session_id: str):
-    data = _load()
-    return data["notes"].get(session_id, [])
+    return _store().get("notes", session_id)
 
 
 def clear_notes(session_id: str):
-    data = _load()
-    data["notes"][session_id] = []
-    _save(data)
+    _store().clear("notes", session_id)
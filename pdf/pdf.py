@@ -1,32 +1,365 @@
 import os
-from typing import List, Optional
+import json
+import zlib
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import numpy as np
 
-from langchain_community.vectorstores import Chroma
+from file_lock import FileLock
+from rag_index import tokenize
+from rag_store import ChunkFile, atomic_write, pack_chunks, source_key
 
-# Embeddings choice:
-# - If you have OpenAI embeddings key: use OpenAIEmbeddings
-# - If not, I recommend local embeddings (sentence-transformers)
+# Local dense vector index (no Chroma, no per-call model load).
 #
-# For simplest setup (and since you're using OpenRouter for chat),
-# we'll use HuggingFace local embeddings to avoid needing a second API.
-from langchain_community.embeddings import HuggingFaceEmbeddings
+# <persist_dir>/<collection>/vectors.f32   -> float32 matrix, one L2-normalized row per chunk (appended)
+# <persist_dir>/<collection>/index.json    -> dim, embedder, n rows, sources {source_id: {start, stop, metadata}}
+# <persist_dir>/<collection>/<key>.jrag    -> chunk texts of one source (rag_store format)
+#
+# Writers (add / remove / compaction) hold <collection>/.lock, so several server
+# workers can index into one collection. The matrix is memory-mapped read-only; a query is one matrix-vector product over
+# the live rows (or the rows of the sources that pass the metadata filter).
+# Re-indexing a source appends new rows and drops the old range; the file is
+# compacted once dead rows outnumber live ones.
+#
+# Embedder: JARVIS_EMBEDDER = "hashing" (default; offline, no download)
+#           or "hf:<model name>", e.g. "hf:sentence-transformers/all-MiniLM-L6-v2".
 
+EMBEDDER = os.getenv("JARVIS_EMBEDDER", "hashing")
+HASHING_DIM = int(os.getenv("JARVIS_HASHING_DIM", "1024"))
+EMBED_BATCH = int(os.getenv("JARVIS_EMBED_BATCH", "64"))
+# one VectorIndex per collection is kept open per process (rag_pdf opens one per session)
+MAX_OPEN_INDEXES = int(os.getenv("JARVIS_VECTOR_MAX_OPEN_INDEXES", "64"))
 
-def _embeddings():
-    # If you have OpenAI API key and want to use OpenAI embeddings, uncomment below:
-    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
+# no idf in a hashing vectorizer, so the commonest function words are dropped instead
+_STOPWORDS = frozenset(
+    "a an the and or but if of to in on at by for with from as is are was were be been being "
+    "it its this that these those i you he she we they me my your do does did have has had "
+    "what when where which who how why can could should would will shall may might not no".split()
+)
 
-def _vectorstore(persist_dir: str, collection_name: str) -> Chroma:
-    os.makedirs(persist_dir, exist_ok=True)
-    return Chroma(
-        collection_name=collection_name,
-        persist_directory=persist_dir,
-        embedding_function=_embeddings(),
-    )
+
+class HashingEmbedder:
+    """
+    Hashed bag of words + character trigrams, signed, sublinear tf, L2-normalized.
+    Deterministic and dependency-free; trigrams give some tolerance to word forms.
+    """
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-v2-{dim}"
+        self._word_features = lru_cache(maxsize=200_000)(self._features)
+
+    def _features(self, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        # (slots, signed weights) of a word and its character trigrams
+        padded = f"#{word}#"
+        grams = [word] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        hashes = np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype=np.int64)
+        weights = np.full(len(grams), 0.5, dtype=np.float32)
+        weights[0] = 1.0
+        return hashes % self.dim, np.where(hashes & 0x80000000, weights, -weights)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vocab: Dict[str, int] = {}
+        ids, rows = [], []
+        for row, text in enumerate(texts):
+            words = [vocab.setdefault(w, len(vocab)) for w in tokenize(text) if w not in _STOPWORDS]
+            ids.extend(words)
+            rows.extend([row] * len(words))
+
+        out = np.zeros(len(texts) * self.dim, dtype=np.float64)
+        if vocab:
+            # features of the batch vocabulary, concatenated (CSR style)
+            feats = [self._word_features(w) for w in vocab]
+            lengths = np.array([len(f[0]) for f in feats], dtype=np.int64)
+            ptr = np.cumsum(lengths) - lengths
+            slots = np.concatenate([f[0] for f in feats])
+            weights = np.concatenate([f[1] for f in feats])
+
+            # distinct (text, word) pairs with counts, expanded to one entry per feature
+            pairs, counts = np.unique(np.array(rows, dtype=np.int64) * len(vocab) + np.array(ids, dtype=np.int64),
+                                      return_counts=True)
+            pair_row, pair_word = pairs // len(vocab), pairs % len(vocab)
+            n_feats = lengths[pair_word]
+            rep = np.repeat(np.arange(len(pairs)), n_feats)
+            g = ptr[pair_word][rep] + (np.arange(len(rep)) - np.repeat(np.cumsum(n_feats) - n_feats, n_feats))
+            out = np.bincount(pair_row[rep] * self.dim + slots[g], weights=weights[g] * counts[rep], minlength=out.size)
+
+        out = out.astype(np.float32).reshape(len(texts), self.dim)
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class HuggingFaceEmbedder:
+    """sentence-transformers model through langchain; loaded once per process."""
+
+    def __init__(self, model_name: str):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        self._model = HuggingFaceEmbeddings(model_name=model_name)
+        self.name = f"hf:{model_name}"
+        self.dim = len(self._model.embed_query("dimension probe"))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vecs = np.asarray(self._model.embed_documents(list(texts)), dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vecs / norms
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """Process-wide embedder singleton."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                if EMBEDDER.startswith("hf:"):
+                    _embedder = HuggingFaceEmbedder(EMBEDDER[3:])
+                else:
+                    _embedder = HashingEmbedder()
+    return _embedder
+
+
+def set_embedder(embedder) -> None:
+    """Swap the embedder (anything with .name, .dim and .embed(texts) -> float32 [n, dim])."""
+    global _embedder
+    with _embedder_lock:
+        _embedder = embedder
+
+
+def embed_batched(texts: Sequence[str], batch_size: int = EMBED_BATCH):
+    """
+    Yields float32 vectors batch by batch so large documents never hold all of them at once.
+    texts only needs len() and slicing, so a rag_store.ChunkFile is read one batch at a time.
+    """
+    embedder = get_embedder()
+    for start in range(0, len(texts), batch_size):
+        yield embedder.embed(texts[start:start + batch_size])
+
+
+class VectorIndex:
+    """Append-only memory-mapped float32 matrix with per-source row ranges."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.meta_path = root / "index.json"
+        self.vectors_path = root / "vectors.f32"
+        self._lock = FileLock(root / ".lock")  # cross-process; taken around every write
+        self._view = None  # (meta mtime_ns, meta, matrix)
+
+    # reading
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {"dim": 0, "embedder": "", "n": 0, "sources": {}}
+
+    def _load(self) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        try:
+            mtime = self.meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self._read_meta(), None
+        view = self._view
+        if view is not None and view[0] == mtime:
+            return view[1], view[2]
+
+        for _ in range(3):
+            meta = self._read_meta()
+            matrix = None
+            if not meta["n"]:
+                break
+            try:
+                # rows past meta["n"] belong to an unfinished append and are ignored
+                matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(meta["n"], meta["dim"]))
+                break
+            except (FileNotFoundError, ValueError):
+                # another worker is compacting: the file was replaced before index.json
+                time.sleep(0.05)
+                mtime = self.meta_path.stat().st_mtime_ns
+        self._view = (mtime, meta, matrix)
+        return meta, matrix
+
+    def sources(self) -> Dict[str, Dict[str, Any]]:
+        return self._load()[0]["sources"]
+
+    def texts(self, source_id: str) -> Optional[ChunkFile]:
+        path = self.root / f"{source_key(source_id)}.jrag"
+        return ChunkFile(path) if path.exists() else None
+
+    # writing
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        atomic_write(self.meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def add(
+        self,
+        source_id: str,
+        chunks: Sequence[str],
+        metadata: Optional[Dict[str, Any]] = None,
+        store_texts: bool = True,
+    ) -> int:
+        """
+        Embed and store chunks for source_id (replacing its previous rows). Returns rows added.
+        store_texts=False when the caller keeps the chunk texts itself (rag_pdf does).
+        """
+        embedder = get_embedder()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # embed outside the lock into a private temp file; only the append is serialized
+        with tempfile.TemporaryFile(dir=self.root) as staged:
+            for vecs in embed_batched(chunks):
+                staged.write(np.ascontiguousarray(vecs, dtype=np.float32).tobytes())
+            staged.seek(0)
+            with self._lock:
+                self._append(source_id, chunks, metadata, store_texts, embedder, staged)
+        return len(chunks)
+
+    def _append(self, source_id: str, chunks: Sequence[str], metadata, store_texts: bool, embedder, staged) -> None:
+        # caller holds self._lock; staged holds the embedded rows
+        meta = self._read_meta()
+        if meta["n"] and (meta["embedder"] != embedder.name or meta["dim"] != embedder.dim):
+            print(f" Vector index {self.root} was built with {meta['embedder']}; rebuilding for {embedder.name}")
+            meta = {"dim": 0, "embedder": "", "n": 0, "sources": {}}
+            self.vectors_path.unlink(missing_ok=True)
+        meta["dim"], meta["embedder"] = embedder.dim, embedder.name
+
+        if store_texts:
+            atomic_write(self.root / f"{source_key(source_id)}.jrag", pack_chunks(source_id, chunks))
+
+        start = meta["n"]
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(start * embedder.dim * 4)  # drop leftovers of an unfinished append
+            shutil.copyfileobj(staged, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        meta["n"] = start + len(chunks)
+        meta["sources"][source_id] = {"start": start, "stop": meta["n"], "metadata": dict(metadata or {})}
+        self._write_meta(meta)
+
+        if self._dead_rows(meta) > self._live_rows(meta):
+            self._compact(meta)
+
+    def remove(self, source_id: str) -> bool:
+        if not self.meta_path.exists():
+            return False
+        with self._lock:
+            meta = self._read_meta()
+            if meta["sources"].pop(source_id, None) is None:
+                return False
+            (self.root / f"{source_key(source_id)}.jrag").unlink(missing_ok=True)
+            self._write_meta(meta)
+            if self._dead_rows(meta) > self._live_rows(meta):
+                self._compact(meta)
+            return True
+
+    @staticmethod
+    def _live_rows(meta: Dict[str, Any]) -> int:
+        return sum(s["stop"] - s["start"] for s in meta["sources"].values())
+
+    def _dead_rows(self, meta: Dict[str, Any]) -> int:
+        return meta["n"] - self._live_rows(meta)
+
+    def _compact(self, meta: Dict[str, Any]) -> None:
+        old = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(meta["n"], meta["dim"])) if meta["n"] else None
+        tmp = self.vectors_path.with_name(f".{self.vectors_path.name}.{os.getpid()}.tmp")
+        row = 0
+        with open(tmp, "wb") as f:
+            for src in sorted(meta["sources"].values(), key=lambda s: s["start"]):
+                f.write(np.ascontiguousarray(old[src["start"]:src["stop"]]).tobytes())
+                size = src["stop"] - src["start"]
+                src["start"], src["stop"] = row, row + size
+                row += size
+            f.flush()
+            os.fsync(f.fileno())
+        del old
+        os.replace(tmp, self.vectors_path)
+        meta["n"] = row
+        self._write_meta(meta)
+
+    # search
+
+    def search(self, question: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[float, str, int]]:
+        """
+        Top-k (cosine score, source_id, chunk index) for question. filter matches
+        source_id and/or source metadata by equality, e.g. {"source_id": "cv.pdf"};
+        a list value matches any of its items.
+        """
+        meta, matrix = self._load()
+        if matrix is None or k <= 0:
+            return []
+        embedder = get_embedder()
+        if meta["embedder"] != embedder.name:
+            print(f" Vector index {self.root} was built with {meta['embedder']}, not {embedder.name}; re-index it")
+            return []
+
+        def matches(sid: str, src: Dict[str, Any]) -> bool:
+            for key, value in (filter or {}).items():
+                actual = sid if key == "source_id" else src["metadata"].get(key)
+                if isinstance(value, (list, tuple, set, frozenset)):
+                    if actual not in value:
+                        return False
+                elif actual != value:
+                    return False
+            return True
+
+        ranges = [(sid, s["start"], s["stop"]) for sid, s in meta["sources"].items() if matches(sid, s)]
+        if not ranges:
+            return []
+
+        q = embedder.embed([question])[0]
+        if len(ranges) == 1:
+            _, a, b = ranges[0]
+            rows = np.arange(a, b)
+            scores = matrix[a:b] @ q
+        else:
+            rows = np.concatenate([np.arange(a, b) for _, a, b in ranges])
+            scores = (matrix @ q)[rows]
+
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        # position in rows -> (source, chunk index)
+        ends = np.cumsum([b - a for _, a, b in ranges])
+        out = []
+        for i in top:
+            pos = int(np.searchsorted(ends, i, side="right"))
+            sid, a, _ = ranges[pos]
+            out.append((float(scores[i]), sid, int(rows[i]) - a))
+        return out
+
+
+_indexes: "OrderedDict[str, VectorIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(persist_dir: str = "rag_db", collection_name: str = "jarvis_pdfs") -> VectorIndex:
+    """One VectorIndex per collection per process (reused across calls, least recently used dropped)."""
+    root = Path(persist_dir) / collection_name
+    key = str(root.resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = VectorIndex(root)
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_OPEN_INDEXES:
+            _indexes.popitem(last=False)
+        return index
 
 
 def index_pdf(
@@ -36,16 +369,17 @@ def index_pdf(
     source_id: Optional[str] = None,
 ) -> int:
     """
-    Load PDF, split into chunks, store in Chroma.
+    Load PDF, split into chunks, store in the local vector index.
     Returns number of chunks stored.
     """
+    # imported here so retrieval (and rag_pdf's hybrid search) works without langchain
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     loader = PyPDFLoader(pdf_path, mode="page")
     docs = loader.load()
 
-    # add source_id metadata
     sid = source_id or os.path.basename(pdf_path)
-    for d in docs:
-        d.metadata["source_id"] = sid
 
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=900,
@@ -53,10 +387,8 @@ def index_pdf(
     )
     chunks = splitter.split_documents(docs)
 
-    vs = _vectorstore(persist_dir, collection_name)
-    vs.add_documents(chunks)
-    vs.persist()
-    return len(chunks)
+    index = get_index(persist_dir, collection_name)
+    return index.add(sid, [c.page_content for c in chunks], metadata={"path": os.path.abspath(pdf_path), "pages": len(docs)})
 
 
 def retrieve_context(
@@ -69,12 +401,14 @@ def retrieve_context(
     """
     Returns top-k chunk texts (optionally filtered by source_id).
     """
-    vs = _vectorstore(persist_dir, collection_name)
-
-    # build search kwargs
-    search_kwargs = {"k": k}
-    if source_id:
-        search_kwargs["filter"] = {"source_id": source_id}
+    index = get_index(persist_dir, collection_name)
+    hits = index.search(question, k=k, filter={"source_id": source_id} if source_id else None)
 
-    docs = vs.similarity_search(question, **search_kwargs)
-    return [d.page_content for d in docs]
+    texts: Dict[str, Optional[ChunkFile]] = {}
+    out = []
+    for _, sid, i in hits:
+        if sid not in texts:
+            texts[sid] = index.texts(sid)
+        if texts[sid] is not None:
+            out.append(texts[sid][i])
+    return out
@@ -0,0 +1,212 @@
+from __future__ import annotations
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import heapq
+import math
+import re
+import struct
+import sys
+
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English; good enough for budgeting
+    return (len(text or "") + 3) // 4
+
+# (n_docs, avgdl, {term: df}) over one or more indexes
+CorpusStats = Tuple[int, float, Dict[str, int]]
+
+def _idf(n_docs: int, df: int) -> float:
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+class BM25Index:
+    """
+    Inverted index over a list of chunks.
+    Built at index time and extended with add(); a query only touches the postings of its own terms.
+    """
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> [(chunk_idx, term_freq), ...]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        self.df: Dict[str, int] = {}
+        self.n_docs = 0
+        self.avgdl = 0.0
+        self._total_len = 0
+        for chunk in chunks:
+            self.add(chunk)
+
+    def add(self, chunk: str) -> int:
+        """Appends one chunk and returns its index."""
+        idx = len(self.lengths)
+        tokens = tokenize(chunk)
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((idx, tf))
+            self.df[term] = self.df.get(term, 0) + 1
+
+        self.n_docs = len(self.lengths)
+        self._total_len += len(tokens)
+        self.avgdl = self._total_len / self.n_docs
+        return idx
+
+    def search(self, query: str, k: int = 4, stats: Optional[CorpusStats] = None) -> List[Tuple[float, int]]:
+        """
+        Returns [(score, chunk_idx), ...] best first. Chunks without a query term are left out.
+        Pass stats (see corpus_stats) to score against several indexes at once so scores are comparable.
+        """
+        if not self.n_docs:
+            return []
+
+        if stats is None:
+            stats = corpus_stats([self], query)
+        n_docs, avgdl, df = stats
+        avgdl = avgdl or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = _idf(n_docs, df.get(term, 0))
+            for idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[idx] / avgdl)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda x: (x[1], -x[0]))
+        return [(score, idx) for idx, score in top]
+
+
+    def tobytes(self) -> bytes:
+        """Serialized index for MappedBM25 (see the layout there)."""
+        terms = sorted((t.encode("utf-8"), t) for t in self.postings)
+        term_offsets = array("I", [0])
+        post_offsets = array("I", [0])
+        df = array("I")
+        postings = array("I")
+        for raw, term in terms:
+            term_offsets.append(term_offsets[-1] + len(raw))
+            for idx, tf in self.postings[term]:
+                postings.append(idx)
+                postings.append(tf)
+            post_offsets.append(len(postings) // 2)
+            df.append(self.df[term])
+        tables = [array("I", self.lengths), df, term_offsets, post_offsets]
+        if sys.byteorder == "big":
+            for t in tables + [postings]:
+                t.byteswap()
+        head = _MAGIC + struct.pack("<IIQ", len(self.lengths), len(terms), self._total_len)
+        return b"".join([head, *(t.tobytes() for t in tables), b"".join(raw for raw, _ in terms), postings.tobytes()])
+
+
+_MAGIC = b"JBM1"
+
+
+def _u32(buf, pos: int, n: int) -> array:
+    out = array("I")
+    out.frombytes(buf[pos:pos + 4 * n])
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out
+
+
+class _MappedPostings:
+    def __init__(self, index: "MappedBM25"):
+        self._ix = index
+
+    def get(self, term: str, default=None):
+        i = self._ix._find(term)
+        if i is None:
+            return default
+        a, b = self._ix._post_offsets[i], self._ix._post_offsets[i + 1]
+        flat = _u32(self._ix._buf, self._ix._postings_pos + 8 * a, 2 * (b - a))
+        return list(zip(flat[0::2], flat[1::2]))
+
+
+class _MappedDF:
+    def __init__(self, index: "MappedBM25"):
+        self._ix = index
+
+    def get(self, term: str, default: int = 0) -> int:
+        i = self._ix._find(term)
+        return default if i is None else self._ix._df[i]
+
+
+class MappedBM25(BM25Index):
+    """
+    Read-only BM25Index over the bytes of BM25Index.tobytes(), usually an mmap, so an
+    index built once at indexing time is shared by every worker without re-tokenizing.
+    Only the per-chunk lengths and term tables are copied out; postings are read per query term.
+
+    Layout (little endian):
+      b"JBM1" | n_docs:u32 | n_terms:u32 | total_len:u64 | lengths:u32*n_docs | df:u32*n_terms
+      | term_offsets:u32*(n_terms+1) | posting_offsets:u32*(n_terms+1)
+      | terms (utf-8, sorted bytewise) | postings (chunk_idx:u32, tf:u32)*
+    """
+
+    def __init__(self, buf, k1: float = 1.5, b: float = 0.75):
+        if bytes(buf[:4]) != _MAGIC:
+            raise ValueError("Not a BM25 index")
+        self.k1 = k1
+        self.b = b
+        n_docs, n_terms, self._total_len = struct.unpack_from("<IIQ", buf, 4)
+        pos = 20
+        self.lengths = _u32(buf, pos, n_docs)
+        pos += 4 * n_docs
+        self._df = _u32(buf, pos, n_terms)
+        pos += 4 * n_terms
+        self._term_offsets = _u32(buf, pos, n_terms + 1)
+        pos += 4 * (n_terms + 1)
+        self._post_offsets = _u32(buf, pos, n_terms + 1)
+        pos += 4 * (n_terms + 1)
+        self._terms_pos = pos
+        self._postings_pos = pos + self._term_offsets[-1]
+        self._buf = buf
+        self._n_terms = n_terms
+        self.n_docs = n_docs
+        self.avgdl = self._total_len / n_docs if n_docs else 0.0
+        self.postings = _MappedPostings(self)
+        self.df = _MappedDF(self)
+
+    def _term(self, i: int) -> bytes:
+        a, b = self._term_offsets[i], self._term_offsets[i + 1]
+        return bytes(self._buf[self._terms_pos + a:self._terms_pos + b])
+
+    def _find(self, term: str) -> Optional[int]:
+        raw = term.encode("utf-8")
+        lo, hi = 0, self._n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._n_terms and self._term(lo) == raw else None
+
+    def add(self, chunk: str) -> int:
+        raise TypeError("MappedBM25 is read-only")
+
+
+def corpus_stats(indexes: Sequence[BM25Index], query: str) -> CorpusStats:
+    """Document count, average length and query-term document frequencies across indexes."""
+    n_docs = sum(ix.n_docs for ix in indexes)
+    total_len = sum(ix.avgdl * ix.n_docs for ix in indexes)
+    df = {t: sum(ix.df.get(t, 0) for ix in indexes) for t in set(tokenize(query))}
+    return n_docs, (total_len / n_docs if n_docs else 0.0), df
+
+
+def search_many(indexes: Sequence[BM25Index], query: str, k: int = 4) -> List[Tuple[float, int, int]]:
+    """Fan out over several indexes and merge. Returns [(score, index_pos, chunk_idx), ...] best first."""
+    stats = corpus_stats(indexes, query)
+    hits = (
+        (score, pos, idx)
+        for pos, ix in enumerate(indexes)
+        for score, idx in ix.search(query, k=k, stats=stats)
+    )
+    return heapq.nlargest(k, hits, key=lambda h: (h[0], -h[1], -h[2]))
@@ -1,110 +1,537 @@
 from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional, List, Tuple
 from pypdf import PdfReader
+import atexit
+import multiprocessing
+import os
 import re
+import threading
 
-_STORE: Dict[str, Dict[str, Any]] = {}
+import rag_store
+from rag_index import search_many, tokenize
+from llm_cache import responses, make_key, model_name, normalize_question
+
+try:
+    from pdf.pdf import get_index as _vector_index
+except ImportError:  # numpy missing -> lexical retrieval only
+    _vector_index = None
+
+# Chunks live in rag_store on disk, so every worker sees every upload.
+# Each PDF is its own segment: uploads append a segment, removal drops one,
+# and queries can fan out over the active PDF, a chosen subset, or all of them.
+
+# Page extraction is fanned out over a process pool for big PDFs.
+PDF_WORKERS = int(os.getenv("JARVIS_PDF_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_MIN_PAGES = int(os.getenv("JARVIS_PDF_PARALLEL_MIN_PAGES", "16"))
+_PAGES_PER_RANGE = 8
+
+# cache kinds; bump when _clean_text / iter_chunks change so stale entries are not reused
+_PAGES_CACHE_KIND = "pages2"
+_CHUNK_CACHE_KIND = "chunks3"
+
+# Chunks are whole sentences (paragraph ends preferred) of CHUNK_MIN..CHUNK_SIZE characters;
+# a sentence longer than CHUNK_SIZE is split at a word boundary.
+CHUNK_MIN = int(os.getenv("JARVIS_PDF_CHUNK_MIN", "500"))
+CHUNK_SIZE = int(os.getenv("JARVIS_PDF_CHUNK_SIZE", "900"))
+# documents indexed by the old fixed-window chunker repeat this many characters between chunks
+_LEGACY_OVERLAP = 120
+
+# Prompt context: retrieved neighbouring chunks are merged back into contiguous spans
+# and packed best-first up to this many (estimated) tokens.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("JARVIS_PDF_CONTEXT_TOKENS", "1500"))
+_CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Hybrid retrieval: BM25 candidates (rag_index) and dense-vector candidates (pdf/pdf.py)
+# are fetched in parallel and merged with reciprocal rank fusion; the fused shortlist
+# can optionally be re-scored. Vectors are stored per session under <RAG_DIR>/_vectors.
+HYBRID = os.getenv("JARVIS_RAG_HYBRID", "1").lower() in {"1", "true", "yes"}
+LEXICAL_DEPTH = int(os.getenv("JARVIS_RAG_LEXICAL_DEPTH", "20"))
+VECTOR_DEPTH = int(os.getenv("JARVIS_RAG_VECTOR_DEPTH", "20"))
+RRF_K = int(os.getenv("JARVIS_RAG_RRF_K", "60"))
+RERANK = os.getenv("JARVIS_RAG_RERANK", "")       # "" (off) or "coverage"
+RERANK_DEPTH = int(os.getenv("JARVIS_RAG_RERANK_DEPTH", "12"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    # created on an ingest thread of a threaded server: fork() there can copy locks held
+    # by other threads into the child, so workers come from a forkserver (spawn where there is none)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context(method))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
 
 def set_active_pdf(session_id: str, source_id: str) -> None:
-    _STORE.setdefault(session_id, {"chunks": [], "sources": [], "active_pdf": None})
-    _STORE[session_id]["active_pdf"] = source_id
+    rag_store.set_active(session_id, source_id)
 
 def get_active_pdf(session_id: str) -> Optional[str]:
-    data = _STORE.get(session_id)
-    if not data:
-        return None
-    return data.get("active_pdf")
+    return rag_store.get_active(session_id)
+
+def list_pdfs(session_id: str) -> List[str]:
+    return rag_store.list_sources(session_id)
+
+def remove_pdf(session_id: str, source_id: str) -> bool:
+    index = _session_vectors(session_id)
+    if index is not None:
+        index.remove(source_id)
+    return rag_store.remove_source(session_id, source_id)
 
 def _clean_text(t: str) -> str:
+    # collapse spacing and line wraps; a blank line (paragraph break) is kept as "\n"
     t = t.replace("\x00", " ")
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+    paragraphs = re.split(r"\n\s*\n", t)
+    return "\n".join(p for p in (re.sub(r"\s+", " ", p).strip() for p in paragraphs) if p)
 
-def _chunk_text(text: str, chunk_size: int = 900, overlap: int = 120) -> List[str]:
-    if not text:
-        return []
-    chunks = []
-    i = 0
-    while i < len(text):
-        chunk = text[i:i+chunk_size]
-        chunks.append(chunk)
-        i += max(1, chunk_size - overlap)
-    return chunks
-
-def index_pdf(session_id: str, file_path: str, source_id: Optional[str] = None) -> int:
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n")
+
+def _split_long(start: int, sentence: str, paragraph_end: bool) -> Iterator[Tuple[int, str, bool]]:
+    while len(sentence) > CHUNK_SIZE:
+        cut = sentence.rfind(" ", 0, CHUNK_SIZE)
+        cut = cut if cut > 0 else CHUNK_SIZE
+        yield start, sentence[:cut], False
+        rest = sentence[cut:]
+        start += cut + len(rest) - len(rest.lstrip())
+        sentence = rest.lstrip()
+    if sentence:
+        yield start, sentence, paragraph_end
+
+def _units(page_text: str) -> Iterator[Tuple[int, str, bool]]:
+    """Sentences of a page as (char offset, text, ends_paragraph); over-long ones split at spaces."""
+    pos = 0
+    for m in _SENTENCE_END_RE.finditer(page_text):
+        yield from _split_long(pos, page_text[pos:m.start()], "\n" in m.group())
+        pos = m.end()
+    # the last sentence of a page may continue on the next one
+    yield from _split_long(pos, page_text[pos:], False)
+
+def iter_chunks(pages: Iterable[str]) -> Iterator[Tuple[int, int, int, str]]:
+    """
+    Streams (first page, char offset in that page, last page, text) chunks from page texts.
+    Only the current page and a chunk or two are held in memory. A chunk may run across
+    a page break; it is located by where it starts and labelled with every page it covers.
+    """
+    parts: List[str] = []
+    size = 0
+    start = (1, 0)
+    last_page = 1
+    held: Optional[Tuple[int, int, int, str]] = None  # kept back so a short final tail can join it
+    for page_no, page_text in enumerate(pages, start=1):
+        for offset, sentence, paragraph_end in _units(page_text):
+            if parts and size + 1 + len(sentence) > CHUNK_SIZE:
+                if size < CHUNK_MIN:
+                    # too short to stand alone: top it up with the head of this sentence
+                    cut = sentence.rfind(" ", 0, CHUNK_SIZE - size)
+                    if cut > 0:
+                        parts.append(sentence[:cut])
+                        last_page = page_no
+                        rest = sentence[cut:]
+                        offset += cut + len(rest) - len(rest.lstrip())
+                        sentence = rest.lstrip()
+                if held:
+                    yield held
+                held = (start[0], start[1], last_page, " ".join(parts))
+                parts, size = [], 0
+            if not parts:
+                start = (page_no, offset)
+            parts.append(sentence)
+            size += len(sentence) + (1 if len(parts) > 1 else 0)
+            last_page = page_no
+            if paragraph_end and size >= CHUNK_MIN:
+                if held:
+                    yield held
+                held = (start[0], start[1], last_page, " ".join(parts))
+                parts, size = [], 0
+    if parts:
+        tail = " ".join(parts)
+        if held and size < CHUNK_MIN and len(held[3]) + 1 + size <= CHUNK_SIZE:
+            held = (held[0], held[1], last_page, f"{held[3]} {tail}")
+        else:
+            if held:
+                yield held
+            held = (start[0], start[1], last_page, tail)
+    if held:
+        yield held
+
+def _extract_range(file_path: str, start: int, stop: int) -> Tuple[int, List[str]]:
+    # runs in a worker process: open a private reader, return cleaned text for pages [start, stop)
+    reader = PdfReader(file_path)
+    return start, [_clean_text(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+def iter_pages(
+    file_path: str,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[str]:
+    """
+    Cleaned text of every page, in page order. Big PDFs are extracted by the process
+    pool a few ranges ahead of the consumer, so finished pages never pile up in memory.
+    """
+    reader = PdfReader(file_path)
+    total = len(reader.pages)
+
+    if PDF_WORKERS <= 1 or total < PARALLEL_MIN_PAGES:
+        for n, page in enumerate(reader.pages, start=1):
+            yield _clean_text(page.extract_text() or "")
+            if progress:
+                progress(n, total)
+        return
+
+    # enough ranges to keep every worker busy, but not so small that pickling dominates
+    step = max(_PAGES_PER_RANGE, -(-total // (PDF_WORKERS * 4)))
+    ranges = iter(range(0, total, step))
+    pool = _get_pool()
+    pending: Deque[Future] = deque()
+
+    def submit_next() -> None:
+        start = next(ranges, None)
+        if start is not None:
+            pending.append(pool.submit(_extract_range, file_path, start, min(start + step, total)))
+
+    for _ in range(PDF_WORKERS * 2):
+        submit_next()
+    done = 0
+    try:
+        while pending:
+            _, texts = pending.popleft().result()
+            submit_next()
+            for text in texts:
+                yield text
+                done += 1
+                if progress:
+                    progress(done, total)
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+def _tee(pages: Iterable[str], writer: rag_store.ChunkWriter) -> Iterator[str]:
+    for text in pages:
+        writer.add(text)
+        yield text
+
+def attach_cached(session_id: str, content_hash: str, source_id: str) -> Optional[int]:
+    """
+    If a PDF with these exact bytes was indexed before (by anyone), attach its
+    cached chunks to this session and make it active. Returns the chunk count, or None on a miss.
+    Only copies chunks; run sync_vectors afterwards (off the request path) for hybrid retrieval.
+    """
+    cached = rag_store.cache_open(content_hash, _CHUNK_CACHE_KIND)
+    if cached is None:
+        return None
+    locations = cached.locations
+    # index=False: the postings were saved (by digest) when this content was first indexed
+    with rag_store.chunk_writer(session_id, source_id, locations=locations is not None, index=False) as out:
+        for i, text in enumerate(cached):
+            out.add(text, *(locations[i] if locations is not None else ()))
+    set_active_pdf(session_id, source_id)
+    return len(cached)
+
+def index_pdf(
+    session_id: str,
+    file_path: str,
+    source_id: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    content_hash: Optional[str] = None,
+) -> int:
+    """
+    Extract, chunk and store a PDF, then make it the session's active PDF.
+    progress(pages_done, pages_total) is called as pages finish, if given.
+    content_hash (sha256 of the file) enables the shared extraction/chunk cache.
+    Pages stream from extraction through the chunker into the .jrag files, so
+    memory use does not grow with the size of the document.
+    """
     p = Path(file_path)
     src = source_id or p.name
 
-    reader = PdfReader(str(p))
-    full_text = []
-    for page in reader.pages:
-        page_text = page.extract_text() or ""
-        page_text = _clean_text(page_text)
-        if page_text:
-            full_text.append(page_text)
-
-    text = "\n".join(full_text)
-    chunks = _chunk_text(text)
-
-    _STORE.setdefault(session_id, {"chunks": [], "sources": [], "active_pdf": None})
-    # store tuples: (source_id, chunk_text)
-    _STORE[session_id]["chunks"] = [(src, c) for c in chunks]
-    _STORE[session_id]["sources"] = [src]
+    if content_hash:
+        cached = attach_cached(session_id, content_hash, src)
+        if cached is not None:
+            sync_vectors(session_id, src)
+            return cached
+
+    with ExitStack() as stack:
+        pages: Iterable[str] = rag_store.cache_open(content_hash, _PAGES_CACHE_KIND) if content_hash else None
+        if pages is None:
+            pages = iter_pages(str(p), progress=progress)
+            if content_hash:
+                pages = _tee(pages, stack.enter_context(rag_store.cache_writer(content_hash, _PAGES_CACHE_KIND)))
+
+        writers = [stack.enter_context(rag_store.chunk_writer(session_id, src, locations=True))]
+        if content_hash:
+            writers.append(stack.enter_context(rag_store.cache_writer(content_hash, _CHUNK_CACHE_KIND, locations=True)))
+        for page_no, offset, last_page, text in iter_chunks(pages):
+            for out in writers:
+                out.add(text, page_no, offset, last_page)
+        count = len(writers[0])
+
     set_active_pdf(session_id, src)
+    sync_vectors(session_id, src)
+
+    return count
+
+# Hybrid retrieval
+
+_hybrid_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-vector")
+
+def _session_vectors(session_id: str):
+    if not HYBRID or _vector_index is None:
+        return None
+    return _vector_index(str(rag_store.RAG_DIR / "_vectors"), rag_store.source_key(session_id))
+
+def sync_vectors(session_id: str, source_id: str) -> None:
+    """
+    Embed a stored document into the session's vector index unless its content is already there.
+    Until it has run, or if it fails (logged, not raised), the document is searched lexically only.
+    """
+    try:
+        index = _session_vectors(session_id)
+        opened = rag_store.open_chunks(session_id, source_id)
+        if index is None or opened is None:
+            return
+        chunks = opened[0]
+        current = index.sources().get(source_id)
+        if current is None or current["metadata"].get("digest") != chunks.digest:
+            # the ChunkFile itself: chunks are decoded one embedding batch at a time
+            index.add(source_id, chunks, metadata={"digest": chunks.digest}, store_texts=False)
+    except Exception as e:
+        print(f" Vector sync failed for {source_id}: {e}")
 
-    return len(chunks)
+def _lexical_candidates(segments, question: str, depth: int) -> List[Tuple[int, int]]:
+    # BM25 per segment over the postings of the query terms only, merged into one ranking
+    return [(pos, i) for _, pos, i in search_many([index for _, index in segments], question, k=depth)]
 
-def retrieve_context(session_id: str, question: str, k: int = 4, source_id: Optional[str] = None) -> List[str]:
-    data = _STORE.get(session_id)
-    if not data:
+def _vector_candidates(session_id: str, sources: List[str], segments, question: str, depth: int) -> List[Tuple[int, int]]:
+    index = _session_vectors(session_id)
+    if index is None or depth <= 0:
         return []
+    # only documents whose vectors match the stored chunks (same digest)
+    stored = index.sources()
+    pos_of = {
+        src: pos for pos, src in enumerate(sources)
+        if stored.get(src, {}).get("metadata", {}).get("digest") == segments[pos][0].digest
+    }
+    if not pos_of:
+        return []
+    hits = index.search(question, k=depth, filter={"source_id": list(pos_of)})
+    return [(pos_of[sid], i) for score, sid, i in hits if score > 0]
+
+def fuse_rankings(rankings: List[List[Tuple[int, int]]], rrf_k: int = RRF_K) -> List[Tuple[int, int]]:
+    """Reciprocal rank fusion: score(d) = sum over rankings of 1 / (rrf_k + rank)."""
+    scores: Dict[Tuple[int, int], float] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit] = scores.get(hit, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def _coverage_rerank(question: str, texts: List[str]) -> List[float]:
+    # share of distinct query terms present in the chunk; exact ids / part numbers count fully
+    terms = set(tokenize(question))
+    if not terms:
+        return [0.0] * len(texts)
+    return [len(terms & set(tokenize(t))) / len(terms) for t in texts]
+
+_RERANKERS: Dict[str, Callable[[str, List[str]], List[float]]] = {"coverage": _coverage_rerank}
 
-    if source_id is None:
-        source_id = get_active_pdf(session_id)
 
-    chunks: List[tuple] = data.get("chunks", [])
-    if source_id:
-        chunks = [x for x in chunks if x[0] == source_id]
+def retrieve_hits(
+    session_id: str,
+    question: str,
+    k: int = 4,
+    source_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
+    lexical_depth: Optional[int] = None,
+    vector_depth: Optional[int] = None,
+) -> List[Tuple[str, int, str, Optional[Tuple[int, int]]]]:
+    """
+    Top-k chunks for a question as (document digest, chunk index, text, (first page, last page) or None).
+    source_ids searches those PDFs (["*"] = every PDF in the session);
+    otherwise source_id, falling back to the active PDF.
+    lexical_depth / vector_depth: candidates taken from each retriever before fusion.
+    """
+    if source_ids:
+        if "*" in source_ids:
+            source_ids = list_pdfs(session_id)
+    else:
+        source_id = source_id or get_active_pdf(session_id)
+        source_ids = [source_id] if source_id else []
 
-    if not chunks:
+    sources, segments = [], []
+    for src in dict.fromkeys(source_ids):
+        opened = rag_store.open_chunks(session_id, src)
+        if opened and len(opened[0]):
+            sources.append(src)
+            segments.append(opened)
+    if not segments:
         return []
 
-    q_words = set(re.findall(r"[a-zA-Z0-9]+", (question or "").lower()))
-    scored = []
-    for _, c in chunks:
-        c_words = set(re.findall(r"[a-zA-Z0-9]+", c.lower()))
-        score = len(q_words.intersection(c_words))
-        scored.append((score, c))
+    lexical_depth = max(k, LEXICAL_DEPTH if lexical_depth is None else lexical_depth)
+    vector_depth = max(k, VECTOR_DEPTH if vector_depth is None else vector_depth)
+
+    vector = None
+    if _session_vectors(session_id) is not None:
+        vector = _hybrid_pool.submit(_vector_candidates, session_id, sources, segments, question, vector_depth)
+    rankings = [_lexical_candidates(segments, question, lexical_depth)]
+    if vector is not None:
+        rankings.append(vector.result())
+
+    fused = fuse_rankings(rankings) if len(rankings) > 1 else rankings[0]
+
+    reranker = _RERANKERS.get(RERANK)
+    if reranker and fused:
+        shortlist = fused[:max(k, RERANK_DEPTH)]
+        scores = reranker(question, [segments[pos][0][i] for pos, i in shortlist])
+        # stable: ties keep their fused order
+        fused = [hit for _, hit in sorted(zip(scores, shortlist), key=lambda x: -x[0])]
 
-    scored.sort(key=lambda x: x[0], reverse=True)
+    def hit(chunks, i):
+        pages = None
+        if chunks.locations is not None:
+            first, _, last = chunks.locations[i]
+            pages = (first, last)
+        return chunks.digest, i, chunks[i], pages
 
-    # if top score is 0, return most recent chunks instead of irrelevant ones
-    if scored and scored[0][0] == 0:
-        return [c for _, c in chunks[:k]]
+    top = [hit(segments[pos][0], i) for pos, i in fused[:k]]
+
+    # if nothing matched, return most recent chunks instead of irrelevant ones
+    if not top:
+        chunks = segments[0][0]
+        return [hit(chunks, i) for i in range(min(k, len(chunks)))]
 
-    # normal top-k
-    top = [c for score, c in scored][:k]
     return top
 
-def ask_pdf(session_id: str, question: str, llm, k: int = 4, source_id: Optional[str] = None) -> str:
-    chunks = retrieve_context(session_id=session_id, question=question, k=k, source_id=source_id)
+# Context packing
+
+_TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    # cheap BPE-like estimate: one token per ~4 word characters, one per punctuation mark
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECE_RE.findall(text or ""))
+
+def _join_neighbours(text: str, following: str) -> str:
+    # chunks from the old fixed-window chunker repeat _LEGACY_OVERLAP characters
+    if following[:_LEGACY_OVERLAP] and text.endswith(following[:_LEGACY_OVERLAP]):
+        return text + following[_LEGACY_OVERLAP:]
+    return f"{text} {following}"
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    lo, hi = 0, len(text)
+    while lo < hi:  # longest prefix within budget
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    return cut[:cut.rfind(" ")] if " " in cut and lo < len(text) else cut
+
+def _page_label(pages: Tuple[int, int]) -> str:
+    first, last = pages
+    return f"[page {first}]" if first == last else f"[pages {first}-{last}]"
+
+def pack_context(
+    hits: List[Tuple[str, int, str, Optional[Tuple[int, int]]]],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+) -> List[str]:
+    """
+    Context passages from ranked hits (digest, chunk index, text, pages): consecutive
+    chunks of one document become one span (without any repeated overlap), labelled
+    with the pages it covers; spans are taken best-ranked first while they fit in token_budget.
+    """
+    rank = {(h[0], h[1]): r for r, h in enumerate(hits)}
 
-    if not chunks:
+    spans: List[list] = []  # [best rank, digest, last chunk index, pages, text]
+    for digest, i, text, pages in sorted(hits, key=lambda h: (h[0], h[1])):
+        last = spans[-1] if spans else None
+        if last is not None and last[1] == digest and i == last[2] + 1:
+            last[4] = _join_neighbours(last[4], text)
+            last[2] = i
+            last[0] = min(last[0], rank[(digest, i)])
+            if last[3] is not None and pages is not None:
+                last[3] = (last[3][0], pages[1])
+        else:
+            spans.append([rank[(digest, i)], digest, i, pages, text])
+
+    separator_cost = estimate_tokens(_CONTEXT_SEPARATOR)
+    packed: List[str] = []
+    used = 0
+    for _, _, _, pages, text in sorted(spans, key=lambda s: s[0]):
+        passage = f"{_page_label(pages)} {text}" if pages is not None else text
+        cost = estimate_tokens(passage) + (separator_cost if packed else 0)
+        if used + cost <= token_budget:
+            packed.append(passage)
+            used += cost
+        elif not packed:
+            # the best span alone is too big: keep its beginning rather than nothing
+            packed.append(_truncate_to_tokens(passage, token_budget))
+            used = token_budget
+    return packed
+
+def retrieve_context(
+    session_id: str,
+    question: str,
+    k: int = 4,
+    source_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
+) -> List[str]:
+    return [hit[2] for hit in retrieve_hits(session_id, question, k=k, source_id=source_id, source_ids=source_ids)]
+
+def build_pdf_prompt(
+    session_id: str,
+    question: str,
+    k: int = 4,
+    source_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
+) -> Tuple[Optional[str], str, Optional[str]]:
+    """
+    Returns (prompt, "", cache_key) ready for the LLM, or (None, message, None) when there is
+    nothing to answer from. Shared by ask_pdf and the chat endpoints.
+    cache_key covers document content, chunk ids and the normalized question; callers add the model.
+    """
+    hits = retrieve_hits(session_id=session_id, question=question, k=k, source_id=source_id, source_ids=source_ids)
+
+    if not hits:
         active = get_active_pdf(session_id)
         if not active:
-            return " No PDF uploaded yet. Upload a PDF first."
-        return f" I couldn’t find relevant text in the active PDF ({active}). Try a more specific question."
+            return None, " No PDF uploaded yet. Upload a PDF first.", None
+        return None, f" I couldn’t find relevant text in the active PDF ({active}). Try a more specific question.", None
 
-    context = "\n\n---\n\n".join(chunks)
+    context = _CONTEXT_SEPARATOR.join(pack_context(hits))
 
     prompt = (
         "You are Jarvis. Answer using ONLY the context from the uploaded PDF.\n"
-        "If the answer is not in the context, say: 'I don't know from this PDF.'\n\n"
+        "If the answer is not in the context, say: 'I don't know from this PDF.'\n"
+        "When a passage is marked [page N] or [pages N-M], cite the page, e.g. (p. N).\n\n"
         f"Context:\n{context}\n\n"
         f"Question:\n{question}\n\n"
         "Answer:"
     )
+    cache_key = make_key("pdf", normalize_question(question), [[h[0], h[1]] for h in hits])
+    return prompt, "", cache_key
+
+def ask_pdf(
+    session_id: str,
+    question: str,
+    llm,
+    k: int = 4,
+    source_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
+) -> str:
+    prompt, message, cache_key = build_pdf_prompt(session_id, question, k=k, source_id=source_id, source_ids=source_ids)
+    if prompt is None:
+        return message
+
+    key = make_key("llm", cache_key, model_name(llm))
+    cached = responses.get(key)
+    if cached is not None:
+        return cached
 
     res = llm.invoke(prompt)
-    return res.content if hasattr(res, "content") else str(res)
+    answer = res.content if hasattr(res, "content") else str(res)
+    responses.put(key, answer)
+    return answer
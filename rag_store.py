@@ -0,0 +1,458 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+
+from rag_index import BM25Index, MappedBM25
+
+# On-disk RAG store shared by every worker process.
+#
+# <RAG_DIR>/<session_key>/active            -> active source_id (plain text)
+# <RAG_DIR>/<session_key>/<source_key>.jrag -> one indexed document
+#
+# .jrag layout (little endian):
+#   b"JRG1" | header_len:u32 | header json | offsets:u64*(n+1)
+#   | [pages:u32*n | page_offsets:u32*n | [last_pages:u32*n]] | utf-8 text blob
+# Chunk i is blob[offsets[i]:offsets[i+1]]; it starts on page pages[i] at character
+# page_offsets[i] and ends on last_pages[i] (the location tables are present when the
+# header has "locations": true, last_pages when it also has "spans": true).
+# Files are written to a temp name and os.replace()d, so readers never see a half-written document.
+# ChunkWriter streams a document: text is spooled to a temp file as chunks arrive and only
+# the offset/location tables are kept in memory until the file is assembled.
+#
+# <RAG_DIR>/_cache/<sha256>.<kind>.jrag -> content-addressed extraction cache
+# (kind is "pages" or "chunks"), shared by every session and bounded by
+# JARVIS_RAG_CACHE_MB with least-recently-used eviction.
+# <RAG_DIR>/_cache/<digest>.bm25 -> BM25 postings of a document (rag_index.MappedBM25),
+# keyed by the chunk digest and written when the document is indexed; workers map it
+# instead of re-tokenizing. If it was evicted, the first worker to need it rebuilds it.
+
+RAG_DIR = Path(os.getenv("JARVIS_RAG_DIR", "rag_store"))
+CACHE_DIR = RAG_DIR / "_cache"
+CACHE_MAX_BYTES = int(float(os.getenv("JARVIS_RAG_CACHE_MB", "512")) * 1024 * 1024)
+# per worker: mapped documents, and (mapped) BM25 indexes keyed by content digest (a document
+# attached to several sessions shares one index); least recently used are dropped
+MAX_OPEN_FILES = int(os.getenv("JARVIS_RAG_MAX_OPEN_FILES", "256"))
+MAX_OPEN_INDEXES = int(os.getenv("JARVIS_RAG_MAX_OPEN_INDEXES", "64"))
+
+_MAGIC = b"JRG1"
+_lock = threading.Lock()
+# path -> (mtime_ns, size, ChunkFile)
+_OPEN: "OrderedDict[str, Tuple[int, int, ChunkFile]]" = OrderedDict()
+# content digest -> BM25Index
+_INDEXES: "OrderedDict[str, BM25Index]" = OrderedDict()
+
+
+def source_key(value: str) -> str:
+    """File-name-safe key for a session or source id."""
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()[:20]
+
+def _session_dir(session_id: str) -> Path:
+    return RAG_DIR / source_key(session_id)
+
+def _source_path(session_id: str, source_id: str) -> Path:
+    return _session_dir(session_id) / f"{source_key(source_id)}.jrag"
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ChunkLocations:
+    """(first page, char offset, last page) of every chunk, as three flat uint32 arrays."""
+
+    def __init__(self):
+        self.pages = array("I")
+        self.offsets = array("I")
+        self.last_pages = array("I")
+
+    def append(self, page: int, offset: int, last_page: Optional[int] = None) -> None:
+        self.pages.append(page)
+        self.offsets.append(offset)
+        self.last_pages.append(page if last_page is None else last_page)
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def __getitem__(self, i: int) -> Tuple[int, int, int]:
+        return self.pages[i], self.offsets[i], self.last_pages[i]
+
+    def tobytes(self) -> bytes:
+        tables = [array("I", t) for t in (self.pages, self.offsets, self.last_pages)]
+        if sys.byteorder == "big":
+            for t in tables:
+                t.byteswap()
+        return b"".join(t.tobytes() for t in tables)
+
+    @classmethod
+    def frombytes(cls, data: bytes, n: int, spans: bool = True) -> "ChunkLocations":
+        # files written before last pages were recorded have only the first two tables
+        table = cls()
+        table.pages.frombytes(data[:4 * n])
+        table.offsets.frombytes(data[4 * n:8 * n])
+        if spans:
+            table.last_pages.frombytes(data[8 * n:12 * n])
+        if sys.byteorder == "big":
+            for t in (table.pages, table.offsets, table.last_pages):
+                t.byteswap()
+        if not spans:
+            table.last_pages = array("I", table.pages)
+        return table
+
+
+class ChunkFile:
+    """Read-only, memory-mapped view of a .jrag file. Chunks are decoded on access."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._mm = self._map()
+
+        if self._mm[:4] != _MAGIC:
+            raise ValueError(f"Not a RAG chunk file: {path}")
+        (header_len,) = struct.unpack_from("<I", self._mm, 4)
+        pos = 8 + header_len
+        self._raw_header = self._mm[:pos]
+        self.header = json.loads(self._mm[8:pos].decode("utf-8"))
+        self.source_id: str = self.header["source_id"]
+
+        self._digest: Optional[str] = self.header.get("digest")
+
+        n = int(self.header["n"])
+        self._offsets = array("Q")
+        self._offsets.frombytes(self._mm[pos:pos + 8 * (n + 1)])
+        if sys.byteorder == "big":
+            self._offsets.byteswap()
+        pos += 8 * (n + 1)
+
+        self.locations: Optional[ChunkLocations] = None
+        if self.header.get("locations"):
+            spans = bool(self.header.get("spans"))
+            size = (12 if spans else 8) * n
+            self.locations = ChunkLocations.frombytes(self._mm[pos:pos + size], n, spans)
+            pos += size
+        self._blob_start = pos
+
+    def _map(self) -> mmap.mmap:
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        """Unmap the file; a later read maps it again (if it is still the same document)."""
+        self._mm.close()
+
+    def _slice(self, a: int, b: Optional[int] = None) -> bytes:
+        try:
+            return self._mm[a:b]
+        except ValueError:
+            if not self._mm.closed:
+                raise
+        # closed by cache eviction while a caller still held this object
+        mm = self._map()
+        if mm[:len(self._raw_header)] != self._raw_header:
+            mm.close()
+            raise ValueError(f"{self.path} changed on disk")
+        self._mm = mm
+        return mm[a:b]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        a = self._blob_start + self._offsets[i]
+        b = self._blob_start + self._offsets[i + 1]
+        return self._slice(a, b).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def digest(self) -> str:
+        """sha256 of the chunk text; identifies the document content (e.g. for answer caching)."""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self._slice(self._blob_start)).hexdigest()
+        return self._digest
+
+
+def _preamble(source_id: str, offsets: array, digest: str, locations: Optional[ChunkLocations]) -> bytes:
+    # everything in front of the text blob
+    n = len(offsets) - 1
+    meta = {"source_id": source_id, "n": n, "digest": digest}
+    table = b""
+    if locations is not None:
+        if len(locations) != n:
+            raise ValueError("one location per chunk expected")
+        meta["locations"] = meta["spans"] = True
+        table = locations.tobytes()
+    header = json.dumps(meta).encode("utf-8")
+    offsets = array("Q", offsets)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return b"".join([_MAGIC, struct.pack("<I", len(header)), header, offsets.tobytes(), table])
+
+
+def pack_chunks(source_id: str, chunks: List[str], locations: Optional[ChunkLocations] = None) -> bytes:
+    """Serialize chunks (and their locations) in the .jrag format; pair with atomic_write."""
+    blobs = [c.encode("utf-8") for c in chunks]
+    offsets = array("Q", [0])
+    digest = hashlib.sha256()
+    for b in blobs:
+        offsets.append(offsets[-1] + len(b))
+        digest.update(b)
+    return _preamble(source_id, offsets, digest.hexdigest(), locations) + b"".join(blobs)
+
+
+class ChunkWriter:
+    """
+    Writes a .jrag file one chunk at a time, for documents too big to pack in memory.
+    Use as a context manager: the file replaces `path` when the block exits cleanly
+    and is discarded if it raises.
+    """
+
+    def __init__(self, path: Path, source_id: str, locations: bool = False, index: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.source_id = source_id
+        self.locations: Optional[ChunkLocations] = ChunkLocations() if locations else None
+        # index=True also builds the document's BM25 postings and saves them on commit
+        self._bm25: Optional[BM25Index] = BM25Index([]) if index else None
+        self._offsets = array("Q", [0])
+        self._digest = hashlib.sha256()
+        self._blob = tempfile.TemporaryFile(dir=path.parent)
+
+    def add(self, text: str, page: int = 0, offset: int = 0, last_page: Optional[int] = None) -> None:
+        data = text.encode("utf-8")
+        self._blob.write(data)
+        self._digest.update(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        if self.locations is not None:
+            self.locations.append(page, offset, last_page)
+        if self._bm25 is not None:
+            self._bm25.add(text)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def commit(self) -> None:
+        tmp = _tmp_path(self.path)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_preamble(self.source_id, self._offsets, self._digest.hexdigest(), self.locations))
+                self._blob.seek(0)
+                shutil.copyfileobj(self._blob, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            self._blob.close()
+        if self._bm25 is not None:
+            _save_bm25(self._digest.hexdigest(), self._bm25)
+
+    def abort(self) -> None:
+        self._blob.close()
+
+    def __enter__(self) -> "ChunkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+def write_chunks(session_id: str, source_id: str, chunks: List[str], locations: Optional[ChunkLocations] = None) -> None:
+    atomic_write(_source_path(session_id, source_id), pack_chunks(source_id, chunks, locations))
+
+def chunk_writer(session_id: str, source_id: str, locations: bool = False, index: bool = True) -> ChunkWriter:
+    """Streaming counterpart of write_chunks; index=False when the BM25 postings already exist."""
+    return ChunkWriter(_source_path(session_id, source_id), source_id, locations, index)
+
+
+def _bm25_path(digest: str) -> Path:
+    return CACHE_DIR / f"{digest}.bm25"
+
+def _save_bm25(digest: str, index: BM25Index) -> None:
+    path = _bm25_path(digest)
+    if not path.exists():
+        atomic_write(path, index.tobytes())
+        _evict_cache()
+
+def _load_bm25(digest: str) -> Optional[MappedBM25]:
+    path = _bm25_path(digest)
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        os.utime(path)  # mark as recently used
+        return MappedBM25(mm)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _bm25_for(chunks: ChunkFile) -> BM25Index:
+    digest = chunks.digest
+    with _lock:
+        index = _INDEXES.get(digest)
+        if index is not None:
+            _INDEXES.move_to_end(digest)
+            return index
+    index = _load_bm25(digest)
+    if index is None:
+        # written before postings were saved, or evicted from the cache: build it once for everyone
+        index = BM25Index(chunks)
+        _save_bm25(digest, index)
+    with _lock:
+        index = _INDEXES.setdefault(digest, index)
+        _INDEXES.move_to_end(digest)
+        while len(_INDEXES) > MAX_OPEN_INDEXES:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def _forget(key: str, close: bool = False) -> None:
+    # caller holds _lock. Only LRU eviction unmaps eagerly: the file is usually unchanged,
+    # so a caller still holding it can map it again. Replaced/removed files are left to GC.
+    entry = _OPEN.pop(key, None)
+    if entry is not None and close:
+        entry[2].close()
+
+
+def open_chunks(session_id: str, source_id: str) -> Optional[Tuple[ChunkFile, BM25Index]]:
+    """
+    Returns (chunks, index) for a document, or None if it was never indexed.
+    Each worker maps the file and builds the BM25 index once (shared by every
+    copy of the same content), then reuses them until the file changes on disk
+    or they fall out of the MAX_OPEN_FILES / MAX_OPEN_INDEXES LRUs.
+    """
+    path = _source_path(session_id, source_id)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+
+    key = str(path)
+    chunks = None
+    with _lock:
+        cached = _OPEN.get(key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            _OPEN.move_to_end(key)
+            chunks = cached[2]
+
+    if chunks is None:
+        chunks = ChunkFile(path)
+        with _lock:
+            _forget(key)
+            _OPEN[key] = (st.st_mtime_ns, st.st_size, chunks)
+            while len(_OPEN) > MAX_OPEN_FILES:
+                _forget(next(iter(_OPEN)), close=True)
+    return chunks, _bm25_for(chunks)
+
+
+def list_sources(session_id: str) -> List[str]:
+    """Every document indexed for a session, oldest first."""
+    found = []
+    for path in _session_dir(session_id).glob("*.jrag"):
+        try:
+            found.append((path.stat().st_mtime_ns, ChunkFile(path).source_id))
+        except (FileNotFoundError, ValueError):
+            continue
+    return [src for _, src in sorted(found)]
+
+
+def remove_source(session_id: str, source_id: str) -> bool:
+    path = _source_path(session_id, source_id)
+    with _lock:
+        _forget(str(path))
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return False
+
+    if get_active(session_id) == source_id:
+        remaining = list_sources(session_id)
+        if remaining:
+            set_active(session_id, remaining[-1])
+        else:
+            (_session_dir(session_id) / "active").unlink(missing_ok=True)
+    return True
+
+
+def set_active(session_id: str, source_id: str) -> None:
+    atomic_write(_session_dir(session_id) / "active", source_id.encode("utf-8"))
+
+def get_active(session_id: str) -> Optional[str]:
+    try:
+        return (_session_dir(session_id) / "active").read_text(encoding="utf-8") or None
+    except FileNotFoundError:
+        return None
+
+
+# Content-addressed cache
+
+def _cache_path(content_hash: str, kind: str) -> Path:
+    return CACHE_DIR / f"{content_hash}.{kind}.jrag"
+
+def cache_open(content_hash: str, kind: str) -> Optional[ChunkFile]:
+    path = _cache_path(content_hash, kind)
+    try:
+        cached = ChunkFile(path)
+        os.utime(path)  # mark as recently used
+    except (FileNotFoundError, ValueError):
+        return None
+    return cached
+
+class _CacheWriter(ChunkWriter):
+    def commit(self) -> None:
+        super().commit()
+        _evict_cache()
+
+def cache_writer(content_hash: str, kind: str, locations: bool = False) -> ChunkWriter:
+    """Writer for a cache entry; evicts old entries once it is committed."""
+    return _CacheWriter(_cache_path(content_hash, kind), content_hash, locations)
+
+def _evict_cache() -> None:
+    entries = []
+    total = 0
+    for path in [*CACHE_DIR.glob("*.jrag"), *CACHE_DIR.glob("*.bm25")]:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+
+    # oldest first until we fit the budget
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= CACHE_MAX_BYTES:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -1,45 +1,48 @@
 import os
+import json
+import asyncio
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Any, Dict
 from dotenv import load_dotenv
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+import intents
 from brain import load_skills, route_command
 from auto_router import auto_route, looks_like_pdf_question  # use your auto_router's function
-from memory_store import get_memories
+from memory_store import memory_context
+from history_store import HistoryManager, BudgetedHistory, llm_summarizer
+from llm_limit import LLMLimiter, LimitedLLM
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
 
-from rag_pdf import index_pdf, get_active_pdf, ask_pdf
-from web_search import web_search
+from rag_pdf import get_active_pdf, build_pdf_prompt, attach_cached, list_pdfs, remove_pdf
+import ingest
+from upload_stream import FilePartParser, MultipartError
+from web_search import web_search, cache_stats as web_cache_stats
+from llm_cache import responses, make_key, model_name, normalize_question
 
 
-# Trigger keywords
-TIME_TRIGGERS = [
-    "time", "current time", "time right now", "what time is it", "what is the time",
-    "time now", "date", "today's date", "current date"
-]
-
-WEB_TRIGGERS = [
-    "current", "latest", "today", "now", "news", "price", "rate", "exchange",
-    "usd", "pkr", "who is the current", "president", "prime minister",
-    "cm of", "chief minister", "updated", "2024", "2025", "2026"
-]
+# Trigger keywords live in intents.py (one matcher for time / web / pdf)
+TIME_TRIGGERS = intents.matcher.trigger_sets.get("time", [])
+WEB_TRIGGERS = intents.matcher.trigger_sets.get("web", [])
 
 def needs_time(text: str) -> bool:
-    t = (text or "").lower().strip()
-    return any(k in t for k in TIME_TRIGGERS)
+    return "time" in intents.classify(text)
 
 def needs_web(text: str) -> bool:
-    t = (text or "").lower().strip()
-    return any(k in t for k in WEB_TRIGGERS)
+    return "web" in intents.classify(text)
 
 def get_now_string() -> str:
     # change this timezone to your preference:
@@ -84,12 +87,27 @@ prompt = ChatPromptTemplate.from_messages([
 
 chain = prompt | llm
 
-_store = {}
+# Concurrency
+# Blocking work (skills, web search, JSON/PDF file I/O) runs on its own sized pool
+# instead of the default threadpool; upstream LLM calls are capped by one limiter
+# shared by the async answer path and the sync calls made from blocking threads.
+BLOCKING_WORKERS = int(os.getenv("JARVIS_BLOCKING_WORKERS", "32"))
+LLM_CONCURRENCY = int(os.getenv("JARVIS_LLM_CONCURRENCY", "16"))
+
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+_llm_slots = LLMLimiter(LLM_CONCURRENCY)
+# what skills, auto_route and the history summarizer get instead of the bare llm
+limited_llm = LimitedLLM(llm, _llm_slots)
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_pool, partial(fn, *args, **kwargs))
+
+# bounded per-session history; prompts get the newest turns that fit the token budget
+histories = HistoryManager(summarizer=llm_summarizer(limited_llm))
 
-def get_history(session_id: str) -> ChatMessageHistory:
-    if session_id not in _store:
-        _store[session_id] = ChatMessageHistory()
-    return _store[session_id]
+def get_history(session_id: str) -> BudgetedHistory:
+    return histories.get(session_id)
 
 jarvis = RunnableWithMessageHistory(
     chain,
@@ -109,32 +127,30 @@ class ChatResponse(BaseModel):
 
 @app.get("/")
 def root():
-    return {"status": "ok", "message": "Jarvis API running", "endpoints": ["/chat", "/upload_pdf", "/docs"]}
-
-@app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    session_id = req.session_id
-    text = (req.text or "").strip()
+    return {"status": "ok", "message": "Jarvis API running", "endpoints": ["/chat", "/chat/stream", "/upload_pdf", "/upload_status/{job_id}", "/pdfs", "/skills", "/cache_stats", "/docs"]}
+
+def _plan_chat(session_id: str, text: str) -> Dict[str, Any]:
+    """
+    Pick the route for a message and do everything up to the final LLM call.
+    Returns one of:
+      {"route", "output"}  -> already answered (time, commands, skills, errors)
+      {"route", "prompt", "cache_key"} -> answer with a single llm call (pdf, web);
+                              the answer is cached under cache_key
+      {"route": "chat", "inputs"} -> answer with the history-aware chain
+    """
     low = text.lower()
 
-    memory_items = get_memories(session_id)
-    memory_context = "\n".join(f"- {m}" for m in memory_items) if memory_items else "No saved memory yet."
-
     # 0) Real time (Python-side)
     if needs_time(text):
-        return ChatResponse(
-            session_id=session_id,
-            route="time",
-            output=f"Current time: {get_now_string()}"
-        )
+        return {"route": "time", "output": f"Current time: {get_now_string()}"}
 
     # 1) Slash commands (/pdf etc.)
-    cmd_result = route_command(text, skills, session_id, llm=llm)
+    cmd_result = route_command(text, skills, session_id, llm=limited_llm)
     if cmd_result == "__CLEAR_CHAT__":
-        _store.pop(session_id, None)
-        return ChatResponse(session_id=session_id, route="clear", output="✅ Chat history cleared.")
+        histories.pop(session_id)
+        return {"route": "clear", "output": "✅ Chat history cleared."}
     if cmd_result is not None:
-        return ChatResponse(session_id=session_id, route="command", output=str(cmd_result))
+        return {"route": "command", "output": str(cmd_result)}
 
     # 2) PDF auto-route ONLY if active pdf exists AND looks like a PDF question
     active_pdf = get_active_pdf(session_id)
@@ -144,21 +160,23 @@ def chat(req: ChatRequest):
             q = "Give a concise summary of this PDF. Include key sections and bullet points."
         else:
             q = text
-        answer = ask_pdf(session_id=session_id, question=q, llm=llm, k=8)
-        return ChatResponse(session_id=session_id, route="pdf", output=answer)
+        pdf_prompt, message, cache_key = build_pdf_prompt(session_id=session_id, question=q, k=8)
+        if pdf_prompt is None:
+            return {"route": "pdf", "output": message}
+        return _serve_cached({"route": "pdf", "prompt": pdf_prompt, "cache_key": make_key("llm", cache_key, model_name(llm))})
 
     # 3) Skills auto-router (for non-pdf skills)
     
-    auto_result = auto_route(text, llm, skills, session_id)
+    auto_result = auto_route(text, limited_llm, skills, session_id)
     if auto_result is not None:
-        return ChatResponse(session_id=session_id, route="skill", output=str(auto_result))
+        return {"route": "skill", "output": str(auto_result)}
 
     # 4) Web search mode (for latest/current questions)
     if needs_web(text):
         try:
             sources = web_search(text, max_results=5)
         except Exception as e:
-            return ChatResponse(session_id=session_id, route="web_error", output=f"❌ Web search failed: {e}")
+            return {"route": "web_error", "output": f"❌ Web search failed: {e}"}
 
         if sources.strip():
             prompt_with_sources = (
@@ -167,28 +185,213 @@ def chat(req: ChatRequest):
                 f"User Question:\n{text}\n\n"
                 "Answer:"
             )
-            ans = llm.invoke(prompt_with_sources)
-            out = ans.content if hasattr(ans, "content") else str(ans)
-            return ChatResponse(session_id=session_id, route="web", output=out)
+            sources_hash = hashlib.sha256(sources.encode("utf-8")).hexdigest()
+            cache_key = make_key("web", sources_hash, normalize_question(text), model_name(llm))
+            return _serve_cached({"route": "web", "prompt": prompt_with_sources, "cache_key": cache_key})
+
+    # 5) Normal chat (the only route that uses saved memory: inject just the relevant ones)
+    return {"route": "chat", "inputs": {"input": text, "memory_context": memory_context(session_id, text)}}
+
+def _serve_cached(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a pdf/web plan into an answered one when the same answer is cached.
+    Called from _plan_chat, i.e. on the blocking pool (the disk tier reads files).
+    """
+    if "cache_key" in plan:
+        cached = responses.get(plan["cache_key"])
+        if cached is not None:
+            return {"route": plan["route"], "output": cached, "cached": True}
+    return plan
+
+@app.get("/skills")
+def skill_stats():
+    return {"ok": True, "skills": skills.stats()}
+
+@app.get("/cache_stats")
+def cache_stats():
+    return {"ok": True, "llm_cache": responses.stats(), "web_cache": web_cache_stats()}
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    session_id = req.session_id
+    text = (req.text or "").strip()
+
+    plan = await run_blocking(_plan_chat, session_id, text)
+    if "output" in plan:
+        return ChatResponse(session_id=session_id, route=plan["route"], output=plan["output"])
+
+    if plan["route"] == "chat":
+        cfg = {"configurable": {"session_id": session_id}}
+        async with _llm_slots:
+            res = await jarvis.ainvoke(plan["inputs"], config=cfg)
+        return ChatResponse(session_id=session_id, route="chat", output=res.content)
+
+    async with _llm_slots:
+        ans = await llm.ainvoke(plan["prompt"])
+    out = ans.content if hasattr(ans, "content") else str(ans)
+    await run_blocking(responses.put, plan["cache_key"], out)
+    return ChatResponse(session_id=session_id, route=plan["route"], output=out)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Same routing as /chat, streamed as Server-Sent Events:
+      meta  {"session_id", "route"}  -> first, before any LLM work
+      token {"text"}                 -> one per streamed piece
+      done  {"output"}               -> full answer
+      error {"error"}
+    """
+    session_id = req.session_id
+    text = (req.text or "").strip()
+
+    # routing may run skills / web search, which block
+    plan = await run_blocking(_plan_chat, session_id, text)
+
+    async def events():
+        yield _sse("meta", {"session_id": session_id, "route": plan["route"]})
+
+        if "output" in plan:
+            yield _sse("token", {"text": plan["output"]})
+            yield _sse("done", {"output": plan["output"]})
+            return
+
+        if plan["route"] == "chat":
+            history = get_history(session_id)
+            runnable, inputs = chain, {**plan["inputs"], "history": history.messages}
+        else:
+            runnable, inputs = llm, plan["prompt"]
 
-    # 5) Normal chat
-    cfg = {"configurable": {"session_id": session_id}}
-    res = jarvis.invoke({"input": text, "memory_context": memory_context}, config=cfg)
-    return ChatResponse(session_id=session_id, route="chat", output=res.content)
+        parts = []
+        try:
+            async with _llm_slots:
+                async for piece in runnable.astream(inputs):
+                    piece_text = piece.content if hasattr(piece, "content") else str(piece)
+                    if piece_text:
+                        parts.append(piece_text)
+                        yield _sse("token", {"text": piece_text})
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+            return
+
+        output = "".join(parts)
+        if plan["route"] == "chat":
+            # only a completed answer goes into the conversation
+            history.add_user_message(text)
+            history.add_ai_message(output)
+        else:
+            await run_blocking(responses.put, plan["cache_key"], output)
+        yield _sse("done", {"output": output})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # PDF upload
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-@app.post("/upload_pdf")
-async def upload_pdf(session_id: str = "default", file: UploadFile = File(...)):
-    if not file.filename.lower().endswith(".pdf"):
-        return {"ok": False, "error": "Only PDF files are supported."}
-
-    save_path = UPLOAD_DIR / file.filename
-    data = await file.read()
-    save_path.write_bytes(data)
+MAX_UPLOAD_MB = float(os.getenv("JARVIS_MAX_UPLOAD_MB", "100"))
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # multipart boundaries and part headers around the file
+PDF_MAGIC = b"%PDF-"
+
+async def _receive_upload(request: Request) -> tuple:
+    """
+    Stream the multipart body into a temp file inside UPLOAD_DIR as it arrives,
+    hashing the file on the fly. Returns (filename, tmp_path, sha256_hex).
+    Raises ValueError (and removes the temp file) if it is too big or not a PDF;
+    the size limit is enforced on the bytes received, before anything is buffered.
+    """
+    max_bytes = int(MAX_UPLOAD_MB * 1024 * 1024)
+    limit = max_bytes + UPLOAD_FORM_OVERHEAD
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        raise ValueError(f"File is larger than {MAX_UPLOAD_MB:g} MB.")
+
+    try:
+        parser = FilePartParser(request.headers.get("content-type", ""), "file")
+    except MultipartError as e:
+        raise ValueError(str(e))
+    hasher = hashlib.sha256()
+    received = size = 0
+    head = b""
+
+    fd, tmp_name = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-", suffix=".part")
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for data in request.stream():
+                received += len(data)
+                if received > limit:
+                    raise ValueError(f"File is larger than {MAX_UPLOAD_MB:g} MB.")
+                pieces = parser.feed(data)
+                if parser.filename is not None and not parser.filename.lower().endswith(".pdf"):
+                    raise ValueError("Only PDF files are supported.")
+                for chunk in pieces:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"File is larger than {MAX_UPLOAD_MB:g} MB.")
+                    if len(head) < 1024:
+                        head += chunk[:1024 - len(head)]
+                        # the PDF header must appear within the first 1 KB
+                        if len(head) >= 1024 and PDF_MAGIC not in head:
+                            raise ValueError("File is not a valid PDF.")
+                    hasher.update(chunk)
+                if pieces:
+                    await run_blocking(out.writelines, pieces)
+            parser.close()
+
+        if PDF_MAGIC not in head:
+            raise ValueError("File is not a valid PDF.")
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    return Path(parser.filename).name, tmp_path, hasher.hexdigest()
 
-    chunks = index_pdf(session_id=session_id, file_path=str(save_path), source_id=file.filename)
-    return {"ok": True, "filename": file.filename, "chunks_indexed": chunks, "active_pdf": file.filename}
+@app.post("/upload_pdf")
+async def upload_pdf(request: Request, session_id: str = "default"):
+    # expects multipart/form-data with the PDF in a "file" field
+    try:
+        filename, tmp_path, content_hash = await _receive_upload(request)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+
+    # identical bytes were indexed before (any name, any session) -> reuse that index
+    chunks = await run_blocking(attach_cached, session_id, content_hash, filename)
+    if chunks is not None:
+        tmp_path.unlink(missing_ok=True)
+        ingest.submit_vector_sync(session_id, filename)
+        return {"ok": True, "job_id": None, "filename": filename, "status": "done",
+                "chunks_indexed": chunks, "cached": True, "active_pdf": filename}
+
+    # content-addressed name: a job still reading an older upload of the same filename keeps its bytes
+    save_path = UPLOAD_DIR / f"{content_hash[:16]}_{filename}"
+    await run_blocking(os.replace, tmp_path, save_path)
+
+    # extraction + indexing run in the background; poll /upload_status/{job_id}
+    job_id = ingest.submit(session_id=session_id, file_path=str(save_path), filename=filename,
+                           content_hash=content_hash)
+    return {"ok": True, "job_id": job_id, "filename": filename, "status": "queued"}
+
+@app.get("/upload_status/{job_id}")
+def upload_status(job_id: str):
+    job = ingest.get_status(job_id)
+    if job is None:
+        return {"ok": False, "error": "Unknown job id."}
+    return {"ok": True, **job}
+
+@app.get("/pdfs")
+def pdfs(session_id: str = "default"):
+    return {"ok": True, "pdfs": list_pdfs(session_id), "active_pdf": get_active_pdf(session_id)}
+
+@app.delete("/pdfs")
+def delete_pdf(source_id: str, session_id: str = "default"):
+    if not remove_pdf(session_id, source_id):
+        return {"ok": False, "error": f"No PDF named {source_id}."}
+    return {"ok": True, "pdfs": list_pdfs(session_id), "active_pdf": get_active_pdf(session_id)}
@@ -1,19 +1,113 @@
+import ast
+import math
+import operator
+import time
+
 COMMAND = "/calc"
 ALIAS = ["/calculate"]
 
-def run(arg: str, context: dict) -> str:
-    if not arg.strip():
-        return "Usage: /calc 2+2 or /calc (25*4)/3"
+# Limits: user input must never be able to pin a worker (e.g. 9**9**9**9).
+MAX_EXPR_LEN = 500          # characters per expression
+MAX_BATCH = 50              # expressions per /calc call (separated by ; or new lines)
+MAX_OPS = 1000              # AST nodes evaluated per expression
+MAX_EXPONENT = 10_000       # |b| in a ** b
+MAX_RESULT_BITS = 4096      # size of any intermediate integer (~1233 digits)
+MAX_SECONDS = 0.05          # wall time per expression
+
+_BINOPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARYOPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+class CalcError(ValueError):
+    pass
+
+
+def _check_size(value):
+    if isinstance(value, complex):
+        # a negative number to a fractional power, e.g. (0-8)**0.5
+        raise CalcError("result is not a real number")
+    if isinstance(value, int) and value.bit_length() > MAX_RESULT_BITS:
+        raise CalcError("result too large")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise CalcError("result too large")
+    return value
+
+
+def _check_pow(base, exp):
+    if abs(exp) > MAX_EXPONENT:
+        raise CalcError(f"exponent larger than {MAX_EXPONENT}")
+    # estimate the result size before computing it
+    if isinstance(base, int) and isinstance(exp, int) and exp > 0 and abs(base) > 1:
+        if base.bit_length() * exp > MAX_RESULT_BITS + exp:
+            raise CalcError("result too large")
+
+
+def evaluate(expr: str):
+    """Evaluates one arithmetic expression under the limits above. Raises CalcError / ArithmeticError."""
+    if len(expr) > MAX_EXPR_LEN:
+        raise CalcError(f"expression longer than {MAX_EXPR_LEN} characters")
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise CalcError(getattr(e, "msg", None) or "invalid syntax")
+
+    deadline = time.monotonic() + MAX_SECONDS
+    ops = 0
+
+    def walk(node):
+        nonlocal ops
+        ops += 1
+        if ops > MAX_OPS:
+            raise CalcError("expression too complex")
+        if time.monotonic() > deadline:
+            raise CalcError("took too long")
+
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARYOPS:
+            return _UNARYOPS[type(node.op)](walk(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            left, right = walk(node.left), walk(node.right)
+            if isinstance(node.op, ast.Pow):
+                _check_pow(left, right)
+            return _check_size(_BINOPS[type(node.op)](left, right))
+        raise CalcError("unsupported expression")
+
+    try:
+        return walk(tree.body)
+    except RecursionError:
+        raise CalcError("expression too deeply nested")
+    except OverflowError:
+        raise CalcError("result too large")
 
-    expr = arg.strip()
 
+def _run_one(expr: str) -> str:
     # Safety: allow only numbers + basic operators
     allowed = set("0123456789+-*/().% ")
     if any(ch not in allowed for ch in expr):
         return "❌ Only numbers and + - * / ( ) % . are allowed."
 
     try:
-        result = eval(expr, {"__builtins__": {}})
+        result = evaluate(expr)
         return f"✅ {expr} = {result}"
     except Exception as e:
         return f"❌ Invalid expression: {e}"
+
+
+def run(arg: str, context: dict) -> str:
+    if not arg.strip():
+        return "Usage: /calc 2+2 or /calc (25*4)/3 (several: /calc 2+2; 3*4)"
+
+    exprs = [e.strip() for e in arg.replace("\n", ";").split(";") if e.strip()]
+    if len(exprs) > MAX_BATCH:
+        return f"❌ At most {MAX_BATCH} expressions per /calc."
+
+    return "\n".join(_run_one(e) for e in exprs)
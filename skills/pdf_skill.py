@@ -3,6 +3,23 @@ from rag_pdf import ask_pdf
 COMMAND = "/pdf"
 ALIAS = ["/doc"]
 
+def _parse(arg: str):
+    """
+    "/pdf ask <question> | source=a.pdf,b.pdf" -> (question, ["a.pdf", "b.pdf"])
+    source=* searches every PDF in the session; no source uses the active PDF.
+    """
+    question, _, opts = (arg or "").partition("|")
+    question = question.strip()
+    if question.lower().startswith("ask "):
+        question = question[4:].strip()
+
+    sources = None
+    opts = opts.strip()
+    if opts.lower().startswith("source="):
+        sources = [s.strip() for s in opts[len("source="):].split(",") if s.strip()] or None
+
+    return question, sources
+
 def run(arg: str, ctx: dict) -> str:
     llm = ctx.get("llm")
     session_id = ctx.get("session_id", "default")
@@ -10,9 +27,9 @@ def run(arg: str, ctx: dict) -> str:
     if llm is None:
         return "❌ LLM not provided."
 
-    question = (arg or "").strip()
+    question, sources = _parse(arg)
     if not question:
-        return "Usage: /pdf <your question>"
+        return "Usage: /pdf <your question> [| source=a.pdf,b.pdf or source=*]"
 
     return ask_pdf(
         session_id=session_id,
@@ -20,4 +37,5 @@ def run(arg: str, ctx: dict) -> str:
         llm=llm,
         k=4,
         source_id=None,
+        source_ids=sources,
     )
@@ -0,0 +1,28 @@
+from rag_pdf import list_pdfs, remove_pdf, get_active_pdf, set_active_pdf
+
+COMMAND = "/pdfs"
+ALIAS = ["/pdf_remove", "/pdf_use"]
+
+def run(arg: str, context: dict) -> str:
+    session_id = context.get("session_id", "default")
+    cmd = context.get("command", COMMAND)
+    name = arg.strip()
+
+    if cmd == "/pdf_remove":
+        if not name:
+            return "Usage: /pdf_remove <filename.pdf>"
+        if remove_pdf(session_id, name):
+            return f"✅ Removed {name}."
+        return f"❌ No PDF named {name}."
+
+    if cmd == "/pdf_use":
+        if name not in list_pdfs(session_id):
+            return f"❌ No PDF named {name}."
+        set_active_pdf(session_id, name)
+        return f"✅ Active PDF: {name}"
+
+    pdfs = list_pdfs(session_id)
+    if not pdfs:
+        return "📄 No PDFs uploaded yet."
+    active = get_active_pdf(session_id)
+    return "📄 PDFs:\n" + "\n".join(f"{i+1}) {p}{' (active)' if p == active else ''}" for i, p in enumerate(pdfs))
@@ -1,8 +1,35 @@
-from memory_store import get_memories
+from memory_store import get_memories, rank_memories
+from rag_index import tokenize
 
 COMMAND = "/recall"
 DESCRIPTION = "Recall saved memories"
 
+# only the best local matches go to the LLM
+CANDIDATES = 8
+# with no lexical match at all, the LLM still sees the newest few (paraphrased questions)
+FALLBACK_RECENT = 20
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "i", "me", "my",
+    "you", "your", "what", "which", "who", "when", "where", "how", "of", "to", "in", "on", "at",
+    "for", "and", "or", "it", "its", "that", "this", "about", "have", "has", "tell", "recall",
+}
+
+def _direct_match(question: str, ranked):
+    """A single memory that clearly answers the question on its own, or None."""
+    if not ranked:
+        return None
+    terms = {t for t in tokenize(question) if t not in _STOPWORDS}
+    if not terms:
+        return None
+
+    top_score, top = ranked[0]
+    runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+    covered = terms & set(tokenize(top))
+    if len(covered) == len(terms) and top_score >= 2 * runner_up:
+        return top
+    return None
+
 def run(arg: str, context: dict) -> str:
     session_id = context.get("session_id", "default")
     llm = context.get("llm")
@@ -19,13 +46,24 @@ def run(arg: str, context: dict) -> str:
             f"- {m}" for m in memories
         )
 
+    ranked = rank_memories(session_id, question, k=CANDIDATES)
+
+    # Strong lexical match: no LLM round-trip needed
+    direct = _direct_match(question, ranked)
+    if direct is not None or llm is None:
+        if direct is None and not ranked:
+            return "I don’t know — nothing saved matches that."
+        return f"From memory: {direct if direct is not None else ranked[0][1]}"
+
+    candidates = [m for _, m in ranked] or memories[-FALLBACK_RECENT:]
+
     # Ask LLM to select relevant memory
     prompt = (
         "You are a memory assistant.\n"
         "From the list of memories below, answer the user's question.\n"
         "If none are relevant, say you don't know.\n\n"
         "Memories:\n"
-        + "\n".join(f"- {m}" for m in memories)
+        + "\n".join(f"- {m}" for m in candidates)
         + f"\n\nQuestion: {question}\nAnswer:"
     )
 
@@ -1,5 +1,7 @@
 COMMAND = "/remember"
 ALIAS = ["/notes", "/clear_notes"]
+# legacy in-memory notes: remember_skills.py / notes_skill.py own these commands
+PRIORITY = -10
 
 _notes: list[str] = []
 
@@ -1,9 +1,37 @@
+from collections import OrderedDict
 from datetime import datetime
 import json
-from typing import Any, Dict
+import re
+import threading
+from typing import Any, Dict, Optional
 
 COMMAND = "/time"
 
+# Your preferred format: DD/MM/YYYY + 12h + seconds + AM/PM
+DEFAULT_SPEC = {"date_fmt": "DD/MM/YYYY", "hour_fmt": "12h", "seconds": True, "ampm": True}
+
+# Rule-based fast path: common phrasings are settled locally, the LLM only sees the rest.
+# Each rule: (pattern, spec changes). Order matters: negations before plain mentions.
+_RULES = [
+    (r"\b(no|without|hide|skip)\s+(the\s+)?(am\s*/?\s*pm|am\s+or\s+pm|meridiem)\b", {"ampm": False}),
+    (r"\b(no|without|hide|skip)\s+(the\s+)?seconds?\b", {"seconds": False}),
+    (r"\b(24|twenty[\s-]?four)[\s-]?(h|hr|hrs|hour|hours)\b|\bmilitary\b", {"hour_fmt": "24h"}),
+    (r"\b(12|twelve)[\s-]?(h|hr|hrs|hour|hours)\b", {"hour_fmt": "12h"}),
+    (r"\b(with|show|include|including|and)\s+(the\s+)?seconds?\b|\bseconds?\b", {"seconds": True}),
+    (r"\b(with\s+)?(am\s*/?\s*pm|am\s+or\s+pm)\b", {"ampm": True}),
+]
+_COMPILED_RULES = [(re.compile(p), change) for p, change in _RULES]
+
+# words that can surround a time request without changing its format
+_PLAIN_WORDS = set("""
+what whats is the time current currently right now please tell me show give it in format
+with and clock a date today todays s what's time's jarvis hey can you could display
+""".split())
+
+_SPEC_CACHE_SIZE = 256
+_spec_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
 def _format_now(now: datetime, spec: Dict[str, Any]) -> str:
     # Defaults (your preferred)
     date_fmt = spec.get("date_fmt", "DD/MM/YYYY")
@@ -30,6 +58,44 @@ def _format_now(now: datetime, spec: Dict[str, Any]) -> str:
 
     return f"{date_str} {time_str}"
 
+def _normalize(user_text: str) -> str:
+    t = (user_text or "").lower().replace("’", "'")
+    t = re.sub(r"[^a-z0-9/'\s-]", " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+def _parse_format_spec(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Local parser for normalized text. Returns a spec, or None if some wording
+    is not understood (then the LLM decides).
+    """
+    spec = dict(DEFAULT_SPEC)
+    rest = text
+    for rx, change in _COMPILED_RULES:
+        if rx.search(rest):
+            spec.update(change)
+            rest = rx.sub(" ", rest)
+
+    leftover = [w for w in re.split(r"[\s/-]+", rest) if w]
+    if any(w not in _PLAIN_WORDS for w in leftover):
+        return None
+    if spec["hour_fmt"] == "24h":
+        spec["ampm"] = False
+    return spec
+
+def _cached_llm_spec(llm, text: str) -> Dict[str, Any]:
+    with _cache_lock:
+        spec = _spec_cache.get(text)
+        if spec is not None:
+            _spec_cache.move_to_end(text)
+            return dict(spec)
+
+    spec = _decide_format_spec(llm, text)
+    with _cache_lock:
+        _spec_cache[text] = dict(spec)
+        while len(_spec_cache) > _SPEC_CACHE_SIZE:
+            _spec_cache.popitem(last=False)
+    return spec
+
 def _decide_format_spec(llm, user_text: str) -> Dict[str, Any]:
     """
     Ask LLM ONLY for formatting, not the time itself.
@@ -58,8 +124,8 @@ def _decide_format_spec(llm, user_text: str) -> Dict[str, Any]:
             raise ValueError("spec not dict")
         return spec
     except Exception:
-        # Fallback to your preferred format: DD/MM/YYYY + 12h + seconds + AM/PM
-        return {"date_fmt": "DD/MM/YYYY", "hour_fmt": "12h", "seconds": True, "ampm": True}
+        # Fallback to your preferred format
+        return dict(DEFAULT_SPEC)
 
 def run(arg: str, context: dict) -> str:
     """
@@ -72,11 +138,11 @@ def run(arg: str, context: dict) -> str:
     # What user asked (if called by auto-router, we pass original text as arg)
     user_text = (arg or "").strip() or "what is the time right now"
 
-    # Decide formatting via "agent"
-    if llm is not None:
-        spec = _decide_format_spec(llm, user_text)
-    else:
-        spec = {"date_fmt": "DD/MM/YYYY", "hour_fmt": "12h", "seconds": True, "ampm": True}
+    # Decide formatting: local rules first, then the (cached) "agent" for unusual wording
+    text = _normalize(user_text)
+    spec = _parse_format_spec(text)
+    if spec is None:
+        spec = _cached_llm_spec(llm, text) if llm is not None else dict(DEFAULT_SPEC)
 
     now = datetime.now()
     return _format_now(now, spec)
@@ -0,0 +1,77 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from skills.calc import MAX_BATCH, CalcError, evaluate, run
+
+# every rejection must come back well inside a request's time budget
+FAST = 0.5
+
+
+def _rejected(expr):
+    start = time.monotonic()
+    with pytest.raises(CalcError):
+        evaluate(expr)
+    assert time.monotonic() - start < FAST
+
+
+@pytest.mark.parametrize("expr", [
+    "9**9**9**9",
+    "2**4096",
+    "10**100000",
+    "99999**999 * 99999**999",
+    "(2**4000) * (2**4000)",
+    "2.5**100000",
+])
+def test_rejects_huge_results(expr):
+    _rejected(expr)
+
+
+@pytest.mark.parametrize("expr", [
+    "factorial(100000)",
+    "math.factorial(10**6)",
+    "__import__('os').system('true')",
+    "[1] * 10**9",
+])
+def test_rejects_calls_and_non_arithmetic(expr):
+    _rejected(expr)
+
+
+@pytest.mark.parametrize("expr", ["(0-8)**0.5", "-8 ** 0.5 * 0 + (-1) ** 0.5", "(-2.5) ** -0.5"])
+def test_rejects_complex_results(expr):
+    _rejected(expr)
+
+
+def test_rejects_deep_nesting():
+    _rejected("(" * 240 + "1" + ")" * 240)
+    _rejected("(" * 5000 + "1" + ")" * 5000)
+    _rejected("-" * 5000 + "1")
+    _rejected("+".join(["1"] * 2000))
+
+
+@pytest.mark.parametrize("expr,expected", [
+    ("2+2", 4),
+    ("(25*4)/3", 100 / 3),
+    ("7 // 2", 3),
+    ("7 % 3", 1),
+    ("-3 ** 2", -9),
+    ("2**10", 1024),
+    ("2**-1", 0.5),
+    ("2**4095", 2 ** 4095),
+    ("1.5 * 4", 6.0),
+])
+def test_evaluates_ordinary_expressions(expr, expected):
+    assert evaluate(expr) == expected
+
+
+def test_run_reports_errors_as_text():
+    assert run("2+2; 3*4", {}) == "✅ 2+2 = 4\n✅ 3*4 = 12"
+    assert run("1/0", {}).startswith("❌")
+    assert run("9**9**9**9", {}).startswith("❌")
+    assert run("factorial(5)", {}).startswith("❌")
+    assert run("(0-8)**0.5", {}) == "❌ Invalid expression: result is not a real number"
+    assert run("; ".join(["1"] * (MAX_BATCH + 1)), {}).startswith("❌")
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_community")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from history_store import HistoryManager
+
+# every message costs 16 tokens, so one turn costs 32
+TURNS = [(HumanMessage(content=f"q{i} " + "x" * 58), AIMessage(content=f"a{i} " + "y" * 58)) for i in range(6)]
+
+
+def _manager():
+    manager = HistoryManager(summarizer=lambda prev, messages: "earlier turns")
+    manager.add_messages("s", [m for turn in TURNS for m in turn])
+    return manager
+
+
+@pytest.mark.parametrize("budget,kept", [(10, []), (31, []), (50, ["q5", "a5"]), (70, ["q4", "a4", "q5", "a5"])])
+def test_prompt_keeps_whole_turns(budget, kept):
+    out = _manager().prompt_messages("s", token_budget=budget)
+    assert [m.content[:2] for m in out] == kept
+
+
+def test_prompt_starts_with_the_summary_then_a_human_turn():
+    manager = _manager()
+    with manager._lock:
+        manager._sessions["s"].summary = "earlier turns"
+    out = manager.prompt_messages("s", token_budget=80)
+    assert out[0].type == "system"
+    assert [m.type for m in out[1:]] == ["human", "ai", "human", "ai"]
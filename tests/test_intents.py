@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intents import DEFAULT_TRIGGERS, IntentMatcher, tokenize
+
+# (message, intents that should fire). The second half are messages the old
+# substring scan misrouted ("now" in "know", "cv" in "cvs", "rate" in "accuracy", ...).
+# bench/bench_intents.py scores both matchers on this same list.
+CORPUS = [
+    ("what time is it", {"time"}),
+    ("what is the current time", {"time", "web"}),
+    ("today's date please", {"time", "web"}),
+    ("latest news about the election", {"web"}),
+    ("usd to pkr exchange rate", {"web"}),
+    ("who is the current prime minister", {"web"}),
+    ("summarize this pdf", {"pdf"}),
+    ("what skills are on my resume", {"pdf"}),
+    ("improve my cv", {"pdf"}),
+    ("do you know python", set()),
+    ("i don't know what to do", set()),
+    ("tell me about renowned scientists", set()),
+    ("write a function to calculate fibonacci", set()),
+    ("explain recursion", set()),
+    ("what is the accuracy of this model", set()),
+    ("how do i operate a forklift", set()),
+    ("give me a separate summary of cvs format", set()),
+    ("what is a datum in geometry", set()),
+]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return IntentMatcher(DEFAULT_TRIGGERS)
+
+
+@pytest.mark.parametrize("text,expected", CORPUS)
+def test_corpus(matcher, text, expected):
+    assert set(matcher.classify(text)) == expected
+
+
+def test_matches_whole_words_only(matcher):
+    assert matcher.classify("NOW") == {"web"}
+    assert matcher.classify("snowfall") == frozenset()
+    assert matcher.classify("") == frozenset()
+
+
+def test_custom_triggers():
+    m = IntentMatcher({"weather": ["forecast", "will it rain"]})
+    assert m.classify("Will it rain tomorrow?") == {"weather"}
+    assert m.classify("will it be sunny") == frozenset()
+
+    uncached = IntentMatcher({"weather": ["forecast"]}, cache_size=0)
+    assert uncached.classify("Forecast please") == {"weather"}
+
+
+def test_tokenize():
+    assert tokenize("Today's USD-PKR rate?") == ("today", "s", "usd", "pkr", "rate")
+    assert tokenize("") == ()
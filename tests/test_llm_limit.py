@@ -0,0 +1,82 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from llm_limit import LLMLimiter, LimitedLLM
+
+
+class FakeLLM:
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def invoke(self, prompt):
+        self._enter()
+        time.sleep(0.02)
+        self._leave()
+        return prompt
+
+    async def ainvoke(self, prompt):
+        self._enter()
+        await asyncio.sleep(0.02)
+        self._leave()
+        return prompt
+
+    async def astream(self, prompt):
+        self._enter()
+        for piece in prompt.split():
+            await asyncio.sleep(0.005)
+            yield piece
+        self._leave()
+
+
+def test_threads_and_event_loop_share_the_slots():
+    fake = FakeLLM()
+    llm = LimitedLLM(fake, LLMLimiter(3))
+
+    threads = [threading.Thread(target=llm.invoke, args=("x",)) for _ in range(8)]
+
+    async def main():
+        async def stream():
+            return [p async for p in llm.astream("a b c")]
+        return await asyncio.gather(*(llm.ainvoke("y") for _ in range(8)), *(stream() for _ in range(4)))
+
+    for t in threads:
+        t.start()
+    results = asyncio.run(main())
+    for t in threads:
+        t.join()
+
+    assert fake.peak == 3
+    assert results[:8] == ["y"] * 8 and results[8:] == [["a", "b", "c"]] * 4
+    assert llm.model_name == "fake-model"
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    limiter = LLMLimiter(1)
+
+    async def main():
+        async with limiter:
+            waiter = asyncio.ensure_future(limiter.__aenter__())
+            await asyncio.sleep(0.02)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(main())
+    assert limiter._slots.acquire(blocking=False)
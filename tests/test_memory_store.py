@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import memory_store
+
+WORKERS = 4
+WRITES = 40
+
+# one worker process: add argv[2] memories named "<argv[1]>-<i>"
+CHILD = """
+import sys
+import memory_store
+for i in range(int(sys.argv[2])):
+    memory_store.add_memory("s", f"{sys.argv[1]}-{i}")
+memory_store.flush()
+"""
+
+READ = "import memory_store; import json; print(json.dumps(memory_store.get_memories('s')))"
+
+
+def _run(cwd, backend, code, *args):
+    env = {**os.environ, "JARVIS_MEMORY_BACKEND": backend, "PYTHONPATH": str(ROOT)}
+    env.pop("JARVIS_MEMORY_DB", None)
+    return subprocess.Popen(
+        [sys.executable, "-c", code, *map(str, args)],
+        cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+
+
+def _read(cwd, backend):
+    out, err = _run(cwd, backend, READ).communicate(timeout=60)
+    assert not err, err
+    return json.loads(out)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "file"])
+def test_concurrent_workers_lose_no_writes(tmp_path, backend):
+    procs = [_run(tmp_path, backend, CHILD, w, WRITES) for w in range(WORKERS)]
+    for p in procs:
+        _, err = p.communicate(timeout=120)
+        assert p.returncode == 0, err
+
+    got = _read(tmp_path, backend)
+    assert sorted(got) == sorted(f"{w}-{i}" for w in range(WORKERS) for i in range(WRITES))
+    for w in range(WORKERS):
+        # each worker's own writes keep their order
+        assert [m for m in got if m.startswith(f"{w}-")] == [f"{w}-{i}" for i in range(WRITES)]
+
+
+def test_journal_backend_refuses_a_second_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    owner = memory_store.JournalBackend()
+    try:
+        procs = [_run(tmp_path, "journal", CHILD, w, WRITES) for w in range(2)]
+        for p in procs:
+            _, err = p.communicate(timeout=60)
+            assert p.returncode != 0 and "single-process only" in err
+
+        for i in range(WRITES):
+            owner.add("memories", "s", f"owner-{i}")
+        owner.flush()
+    finally:
+        owner._owner.release()
+
+    assert _read(tmp_path, "journal") == [f"owner-{i}" for i in range(WRITES)]
+
+
+def test_json_and_journal_migrate_into_sqlite_once(tmp_path):
+    (tmp_path / "memory.json").write_text(json.dumps({
+        "memories": {"s": ["from snapshot"]},
+        "notes": ["very old flat note"],
+    }), encoding="utf-8")
+    journal = [
+        {"op": "add", "kind": "memories", "session_id": "s", "text": "from journal"},
+        {"op": "add", "kind": "notes", "session_id": "other", "text": "note"},
+    ]
+    (tmp_path / "memory.json.journal").write_text(
+        "".join(json.dumps(e) + "\n" for e in journal), encoding="utf-8"
+    )
+
+    # several workers start at once; exactly one of them migrates
+    procs = [_run(tmp_path, "sqlite", CHILD, w, 1) for w in range(WORKERS)]
+    for p in procs:
+        _, err = p.communicate(timeout=60)
+        assert p.returncode == 0, err
+
+    got = _read(tmp_path, "sqlite")
+    assert got[:2] == ["from snapshot", "from journal"]
+    assert sorted(got[2:]) == [f"{w}-0" for w in range(WORKERS)]
+
+    notes = "import memory_store; import json; print(json.dumps([memory_store.get_notes('default'), memory_store.get_notes('other')]))"
+    out, err = _run(tmp_path, "sqlite", notes).communicate(timeout=60)
+    assert json.loads(out) == [["very old flat note"], ["note"]], err
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(memory_store, "_backend", memory_store.SQLiteBackend(str(tmp_path / "memory.db")))
+    monkeypatch.setattr(memory_store, "_mem_index", memory_store.OrderedDict())
+    return memory_store
+
+
+def test_memory_indexes_are_bounded(store, monkeypatch):
+    monkeypatch.setattr(store, "MEMORY_MAX_INDEXES", 3)
+    for s in "abcde":
+        store.add_memory(s, f"my favourite colour is {s}")
+        assert store.rank_memories(s, "favourite colour")
+    assert list(store._mem_index) == ["c", "d", "e"]
+
+    # an evicted session is rebuilt from the store on its next read
+    assert store.relevant_memories("a", "colour") == ["my favourite colour is a"]
+    assert list(store._mem_index) == ["d", "e", "a"]
+
+
+def test_relevant_memories_fit_the_token_budget(store):
+    store.add_memory("s", "cats " * 100)
+    store.add_memory("s", "I have two cats")
+    assert store.relevant_memories("s", "cats", token_budget=20) == ["I have two cats"]
+    assert len(store.relevant_memories("s", "cats", token_budget=200)) == 2
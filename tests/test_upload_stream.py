@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from upload_stream import FilePartParser, MultipartError
+
+# a near-miss of the delimiter inside the file must pass through untouched
+CONTENT = b"%PDF-1.4\r\n" + os.urandom(50_000) + b"\r\n--Boun" + os.urandom(1000)
+BODY = (
+    b"--Bound\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n"
+    b"--Bound\r\nContent-Disposition: form-data; name=\"file\"; filename=\"report.pdf\"\r\n"
+    b"Content-Type: application/pdf\r\n\r\n" + CONTENT + b"\r\n--Bound--\r\n"
+)
+
+
+def _feed(parser, body, sizes):
+    out, i = [], 0
+    while i < len(body):
+        n = random.choice(sizes)
+        out += parser.feed(body[i:i + n])
+        i += n
+    return b"".join(out)
+
+
+@pytest.mark.parametrize("sizes", [[1], [1, 2, 3, 7], [4096], [1 << 20]])
+def test_extracts_file_part_across_any_split(sizes):
+    random.seed(len(sizes))
+    parser = FilePartParser("multipart/form-data; boundary=Bound")
+    assert _feed(parser, BODY, sizes) == CONTENT
+    parser.close()
+    assert parser.filename == "report.pdf"
+
+
+def test_quoted_boundary():
+    parser = FilePartParser('multipart/form-data; boundary="Bound"')
+    assert _feed(parser, BODY, [999]) == CONTENT
+
+
+def test_truncated_or_missing_file_fails():
+    parser = FilePartParser("multipart/form-data; boundary=Bound")
+    parser.feed(BODY[:len(BODY) // 2])
+    with pytest.raises(MultipartError):
+        parser.close()
+
+    parser = FilePartParser("multipart/form-data; boundary=Bound")
+    parser.feed(b"--Bound\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhi\r\n--Bound--\r\n")
+    with pytest.raises(MultipartError):
+        parser.close()
+
+
+def test_rejects_non_multipart():
+    with pytest.raises(MultipartError):
+        FilePartParser("application/pdf")
+    with pytest.raises(MultipartError):
+        FilePartParser("multipart/form-data")
@@ -0,0 +1,105 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import web_search
+from llm_cache import normalize_question
+
+
+class FakeProvider:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.fail = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, query, max_results):
+        self.calls.append(query)
+        self.release.wait(5)
+        time.sleep(self.delay)
+        if self.fail is not None:
+            raise self.fail
+        return [{"title": f"{query} #{len(self.calls)}", "href": "https://example.com", "body": "..."}]
+
+
+@pytest.fixture
+def provider():
+    fake = FakeProvider()
+    web_search.set_provider(fake)
+    yield fake
+    fake.release.set()
+
+
+def test_identical_queries_share_one_fetch(provider):
+    provider.delay = 0.2
+    queries = ["who wrote hamlet", "Who wrote  Hamlet?", "who wrote hamlet."] * 10
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        results = list(pool.map(web_search.web_search, queries))
+    assert len(provider.calls) == 1
+    assert len(set(results)) == 1
+
+
+def test_cached_until_ttl_expires(provider, monkeypatch):
+    monkeypatch.setattr(web_search, "DEFAULT_TTL", 0.1)
+    first = web_search.web_search("who wrote hamlet")
+    assert web_search.web_search("who wrote hamlet") == first
+    assert len(provider.calls) == 1
+
+    time.sleep(0.15)
+    assert web_search.web_search("who wrote hamlet") != first
+    assert len(provider.calls) == 2
+
+
+def test_deadline_falls_back_to_stale(provider):
+    first = web_search.web_search("who wrote hamlet")
+    web_search.expire_cache()
+    provider.release.clear()
+
+    start = time.monotonic()
+    assert web_search.web_search("who wrote hamlet", deadline=0.1) == first
+    assert time.monotonic() - start < 1
+
+    # the late fetch still lands and refreshes the cache
+    provider.release.set()
+    while web_search.cache_stats()["inflight"]:
+        time.sleep(0.01)
+    assert web_search.web_search("who wrote hamlet") != first
+    assert len(provider.calls) == 2
+
+
+def test_timeout_without_stale_raises(provider):
+    provider.release.clear()
+    with pytest.raises(TimeoutError):
+        web_search.web_search("who wrote hamlet", deadline=0.05)
+
+
+def test_provider_error_falls_back_to_stale_or_raises(provider):
+    first = web_search.web_search("who wrote hamlet")
+    web_search.expire_cache()
+    provider.fail = RuntimeError("upstream down")
+    assert web_search.web_search("who wrote hamlet") == first
+
+    with pytest.raises(RuntimeError):
+        web_search.web_search("who is the mayor")
+
+
+def test_set_provider_drops_or_keeps_the_cache(provider):
+    first = web_search.web_search("who wrote hamlet")
+    other = FakeProvider()
+    web_search.set_provider(other, keep_cache=True)
+    assert web_search.web_search("who wrote hamlet") == first
+    web_search.set_provider(other)
+    web_search.web_search("who wrote hamlet")
+    assert len(other.calls) == 1
+
+
+def test_query_normalization_matches_the_llm_cache():
+    for text in ["USD to PKR rate?", "  latest\tnews!! ", ""]:
+        assert web_search.normalize_query(text) == normalize_question(text)
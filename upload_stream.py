@@ -0,0 +1,101 @@
+from typing import List, Optional
+import re
+
+# Incremental multipart/form-data parser for one file field.
+# Starlette's UploadFile only exists after the whole request body has been
+# received and spooled, which is too late to enforce an upload size limit.
+# The server feeds this the raw body as it arrives and counts the bytes itself.
+
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_PARAM_RE = r'[;\s]{}="([^"]*)"'
+
+
+class MultipartError(ValueError):
+    pass
+
+
+def _param(header: str, name: str) -> Optional[str]:
+    m = re.search(_PARAM_RE.format(name), header, re.IGNORECASE)
+    return m.group(1) if m else None
+
+
+class FilePartParser:
+    """
+    feed(data) returns the pieces of the `field` part's content found in data;
+    once its headers have been read, .filename holds the client's file name.
+    close() raises MultipartError unless the part was received completely.
+    """
+
+    def __init__(self, content_type: str, field: str = "file"):
+        if not content_type.lower().startswith("multipart/form-data"):
+            raise MultipartError("Expected a multipart/form-data upload.")
+        m = _BOUNDARY_RE.search(content_type)
+        if not m:
+            raise MultipartError("Multipart upload without a boundary.")
+        self.field = field
+        self.filename: Optional[str] = None
+        self.complete = False
+        self._delimiter = b"\r\n--" + m.group(1).encode("latin-1")
+        # pretend the body starts with CRLF so the first delimiter looks like every other one
+        self._buf = b"\r\n"
+        self._state = "preamble"   # preamble -> after -> headers -> body -> after ... -> end
+        self._target = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self._buf += data
+        out: List[bytes] = []
+        while True:
+            if self._state in ("preamble", "body"):
+                i = self._buf.find(self._delimiter)
+                if i < 0:
+                    # keep a tail that could be the start of a delimiter split across reads
+                    keep = len(self._delimiter) - 1
+                    if len(self._buf) > keep:
+                        if self._state == "body" and self._target:
+                            out.append(self._buf[:-keep])
+                        self._buf = self._buf[-keep:]
+                    return out
+                if self._state == "body" and self._target:
+                    if i:
+                        out.append(self._buf[:i])
+                    self.complete = True
+                self._buf = self._buf[i + len(self._delimiter):]
+                self._state = "after"
+            elif self._state == "after":
+                if len(self._buf) < 2:
+                    return out
+                if self._buf[:2] == b"--":
+                    self._state = "end"
+                elif self._buf[:2] == b"\r\n":
+                    self._state = "headers"
+                else:
+                    raise MultipartError("Malformed multipart body.")
+                self._buf = self._buf[2:]
+            elif self._state == "headers":
+                i = self._buf.find(b"\r\n\r\n")
+                if i < 0:
+                    if len(self._buf) > MAX_PART_HEADER_BYTES:
+                        raise MultipartError("Multipart part headers too large.")
+                    return out
+                self._start_part(self._buf[:i].decode("utf-8", "replace"))
+                self._buf = self._buf[i + 4:]
+                self._state = "body"
+            else:  # end: ignore the epilogue
+                self._buf = b""
+                return out
+
+    def _start_part(self, headers: str) -> None:
+        disposition = ""
+        for line in headers.split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-disposition":
+                disposition = value
+        self._target = not self.complete and _param(disposition, "name") == self.field
+        if self._target:
+            self.filename = _param(disposition, "filename") or ""
+
+    def close(self) -> None:
+        if not self.complete:
+            raise MultipartError(f"Upload is missing the '{self.field}' file or was cut off.")
@@ -1,13 +1,183 @@
 # web_search.py
-from duckduckgo_search import DDGS
-
-def web_search(query: str, max_results: int = 5) -> str:
-    results = []
-    with DDGS() as ddgs:
-        for r in ddgs.text(query, max_results=max_results):
-            title = (r.get("title") or "").strip()
-            href = (r.get("href") or "").strip()
-            body = (r.get("body") or "").strip()
-            if title or href or body:
-                results.append(f"- {title}\n  {href}\n  {body}")
-    return "\n".join(results)
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import importlib
+import os
+import threading
+import time
+
+import intents
+from llm_cache import normalize_question
+
+# Results are cached per normalized query. How long depends on what is asked:
+# prices/rates go stale in minutes, news in tens of minutes, everything else in hours.
+# Identical queries already in flight share one fetch (single-flight). A fetch that
+# misses the deadline returns the last (stale) results if there are any; the fetch
+# keeps running in the background and refreshes the cache when it lands.
+#
+# The provider is pluggable: provider(query, max_results) -> [{"title", "href", "body"}].
+# Set it with set_provider() or JARVIS_WEB_PROVIDER="module:function".
+
+WEB_CACHE_SIZE = int(os.getenv("JARVIS_WEB_CACHE_SIZE", "512"))
+WEB_DEADLINE = float(os.getenv("JARVIS_WEB_DEADLINE", "8"))          # seconds per search
+WEB_STALE_MAX = float(os.getenv("JARVIS_WEB_STALE_MAX", "86400"))    # oldest stale result still served
+WEB_WORKERS = int(os.getenv("JARVIS_WEB_WORKERS", "8"))
+
+# query class -> (trigger words, ttl seconds); first match wins
+QUERY_CLASSES: List[Tuple[str, frozenset, float]] = [
+    ("market", frozenset({"price", "rate", "exchange", "usd", "pkr", "stock", "bitcoin", "gold"}),
+     float(os.getenv("JARVIS_WEB_TTL_MARKET", "120"))),
+    ("news", frozenset({"news", "latest", "today", "now", "current", "updated", "score", "weather"}),
+     float(os.getenv("JARVIS_WEB_TTL_NEWS", "600"))),
+]
+DEFAULT_TTL = float(os.getenv("JARVIS_WEB_TTL_DEFAULT", "21600"))
+
+Provider = Callable[[str, int], List[Dict[str, str]]]
+
+
+def ddg_provider(query: str, max_results: int) -> List[Dict[str, str]]:
+    from duckduckgo_search import DDGS
+
+    with DDGS(timeout=max(1, int(WEB_DEADLINE))) as ddgs:
+        return list(ddgs.text(query, max_results=max_results))
+
+
+def _load_provider() -> Provider:
+    spec = os.getenv("JARVIS_WEB_PROVIDER")
+    if not spec:
+        return ddg_provider
+    try:
+        module, _, name = spec.partition(":")
+        return getattr(importlib.import_module(module), name or "search")
+    except (ImportError, AttributeError) as e:
+        print(f" Ignoring JARVIS_WEB_PROVIDER={spec}: {e}")
+        return ddg_provider
+
+
+_provider: Provider = _load_provider()
+
+
+def set_provider(provider: Provider, keep_cache: bool = False) -> None:
+    """
+    Swap the search backend. Results cached from the previous one are dropped
+    unless keep_cache=True (they are then still served, fresh or as stale fallback).
+    """
+    global _provider
+    with _lock:
+        _provider = provider
+        _inflight.clear()  # fetches still running on the old provider must not be shared
+        if not keep_cache:
+            _cache.clear()
+
+
+def expire_cache() -> None:
+    """Mark every cached result stale: the next search refetches, falling back to it on deadline/error."""
+    with _lock:
+        for key, (fetched_at, ttl, text) in list(_cache.items()):
+            _cache[key] = (fetched_at - ttl, ttl, text)
+
+
+def shutdown() -> None:
+    """Stop the fetch pool without waiting for fetches still running."""
+    _pool.shutdown(wait=False, cancel_futures=True)
+
+
+# one normalization for web cache keys and the LLM answer cache keys built from the same text
+normalize_query = normalize_question
+
+
+def query_ttl(query: str) -> Tuple[str, float]:
+    words = set(intents.tokenize(query))
+    for name, triggers, ttl in QUERY_CLASSES:
+        if words & triggers:
+            return name, ttl
+    return "default", DEFAULT_TTL
+
+
+def _format(results: List[Dict[str, str]]) -> str:
+    lines = []
+    for r in results:
+        title = (r.get("title") or "").strip()
+        href = (r.get("href") or "").strip()
+        body = (r.get("body") or "").strip()
+        if title or href or body:
+            lines.append(f"- {title}\n  {href}\n  {body}")
+    return "\n".join(lines)
+
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, int], Tuple[float, float, str]]" = OrderedDict()  # key -> (fetched_at, ttl, text)
+_inflight: Dict[Tuple[str, int], Future] = {}
+_pool = ThreadPoolExecutor(max_workers=WEB_WORKERS, thread_name_prefix="web")
+_stats = {"hits": 0, "misses": 0, "shared": 0, "stale": 0, "timeouts": 0, "errors": 0}
+
+
+def _fetch(key: Tuple[str, int], query: str, ttl: float) -> str:
+    provider = _provider
+    try:
+        text = _format(provider(query, key[1]))
+        if text.strip():  # an empty page is usually a blip upstream; don't pin it
+            with _lock:
+                if provider is _provider:
+                    _cache[key] = (time.time(), ttl, text)
+                    _cache.move_to_end(key)
+                    while len(_cache) > WEB_CACHE_SIZE:
+                        _cache.popitem(last=False)
+        return text
+    finally:
+        with _lock:
+            if provider is _provider:
+                _inflight.pop(key, None)
+
+
+def web_search(query: str, max_results: int = 5, deadline: Optional[float] = None) -> str:
+    """
+    Formatted search results for query. Cached, deduplicated and bounded by
+    deadline (default WEB_DEADLINE); raises TimeoutError / the provider's error
+    only when there is no earlier result to fall back to.
+    """
+    norm = normalize_query(query)
+    key = (norm, max_results)
+    _, ttl = query_ttl(norm)
+    now = time.time()
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and now - entry[0] < entry[1]:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[2]
+        future = _inflight.get(key)
+        if future is None:
+            _stats["misses"] += 1
+            future = _pool.submit(_fetch, key, query, ttl)
+            _inflight[key] = future
+        else:
+            _stats["shared"] += 1
+
+    stale = entry[2] if entry is not None and now - entry[0] < WEB_STALE_MAX else None
+    try:
+        return future.result(timeout=WEB_DEADLINE if deadline is None else deadline)
+    except FutureTimeout:
+        with _lock:
+            _stats["timeouts"] += 1
+            if stale is not None:
+                _stats["stale"] += 1
+        if stale is not None:
+            return stale
+        raise TimeoutError(f"no results within {WEB_DEADLINE if deadline is None else deadline:g}s")
+    except Exception:
+        with _lock:
+            _stats["errors"] += 1
+            if stale is not None:
+                _stats["stale"] += 1
+        if stale is not None:
+            return stale
+        raise
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {"entries": len(_cache), "inflight": len(_inflight), **_stats}